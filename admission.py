@@ -0,0 +1,203 @@
+"""
+Admission control for browser scrapes.
+
+Each endpoint class has its own concurrency budget and queue-depth limit,
+and all classes share a cap on open browser sessions. When a slot frees up
+it goes to the most urgent waiting class, so cheap badge scrapes are not
+stuck behind bulk problem-list pulls. Callers that cannot be queued, or
+that wait longer than ADMISSION_QUEUE_TIMEOUT, get Overloaded with a
+Retry-After hint instead of waiting for Playwright to time out.
+"""
+
+import asyncio
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from metrics import phase
+
+
+# Configuration
+# Defaults to the pages the whole browser fleet can hold
+_FLEET_ENDPOINTS = len([u for u in os.environ.get("BROWSER_URLS", "").split(",") if u.strip()]) or 1
+ADMISSION_MAX_SESSIONS = int(os.environ.get(
+    "ADMISSION_MAX_SESSIONS", str(int(os.environ.get("BROWSER_POOL_SIZE", "4")) * _FLEET_ENDPOINTS)
+))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "20"))
+
+
+def _env_budget(name: str, concurrency: int, queue: int):
+    return (
+        int(os.environ.get(f"ADMISSION_{name.upper()}_CONCURRENCY", str(concurrency))),
+        int(os.environ.get(f"ADMISSION_{name.upper()}_QUEUE", str(queue))),
+    )
+
+
+@dataclass
+class EndpointClass:
+    name: str
+    priority: int  # lower is more urgent
+    max_concurrent: int
+    max_queue: int
+    in_flight: int = 0
+    queued: int = 0
+    admitted: int = 0
+    rejected: int = 0
+    avg_duration: float = 5.0  # seconds, exponentially weighted
+
+    def observe(self, duration: float):
+        self.avg_duration = 0.8 * self.avg_duration + 0.2 * duration
+
+
+# name: (priority, default concurrency, default queue depth)
+DEFAULT_CLASSES = {
+    "badge": (0, 4, 100),
+    "stats": (1, 4, 50),
+    "profile": (2, 3, 50),
+    "problems": (3, 2, 10),
+    "background": (4, 1, 20),
+}
+
+_ENDPOINT_CLASS: ContextVar[Optional[str]] = ContextVar("endpoint_class", default=None)
+
+
+def set_endpoint_class(name: str):
+    """Marks scrapes started by the current request as belonging to an endpoint class"""
+    _ENDPOINT_CLASS.set(name)
+
+
+def endpoint_class(default: str) -> str:
+    return _ENDPOINT_CLASS.get() or default
+
+
+class Overloaded(Exception):
+    """Raised when a scrape is shed instead of queued"""
+
+    def __init__(self, endpoint_class: str, retry_after: int):
+        super().__init__(f"Server busy, {endpoint_class} scrapes are saturated")
+        self.endpoint_class = endpoint_class
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    cls: EndpointClass = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class AdmissionScheduler:
+    """Priority admission in front of browser sessions"""
+
+    def __init__(self, max_sessions: int = ADMISSION_MAX_SESSIONS,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.queue_timeout = queue_timeout
+        self.classes: Dict[str, EndpointClass] = {}
+        for name, (priority, concurrency, queue) in DEFAULT_CLASSES.items():
+            concurrency, queue = _env_budget(name, concurrency, queue)
+            self.classes[name] = EndpointClass(name, priority, concurrency, queue)
+        self._in_flight = 0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+
+    def _can_run(self, cls: EndpointClass) -> bool:
+        return self._in_flight < self.max_sessions and cls.in_flight < cls.max_concurrent
+
+    def _retry_after(self, cls: EndpointClass) -> int:
+        backlog = cls.queued + cls.in_flight + 1
+        return max(1, math.ceil(cls.avg_duration * backlog / max(cls.max_concurrent, 1)))
+
+    def _grant(self, cls: EndpointClass):
+        self._in_flight += 1
+        cls.in_flight += 1
+        cls.admitted += 1
+
+    def _dispatch(self):
+        """Hands free slots to waiters, most urgent class first"""
+        self._waiters.sort()
+        for waiter in list(self._waiters):
+            if self._in_flight >= self.max_sessions:
+                break
+            if waiter.future.done() or not self._can_run(waiter.cls):
+                continue
+            self._waiters.remove(waiter)
+            waiter.cls.queued -= 1
+            self._grant(waiter.cls)
+            waiter.future.set_result(None)
+
+    async def _acquire(self, cls: EndpointClass):
+        # Earlier waiters of the same class keep their place in line
+        if self._can_run(cls) and cls.queued == 0:
+            self._grant(cls)
+            return
+
+        if cls.queued >= cls.max_queue:
+            cls.rejected += 1
+            raise Overloaded(cls.name, self._retry_after(cls))
+
+        waiter = _Waiter(cls.priority, next(self._seq), cls, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        cls.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except BaseException as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as we gave up; hand the slot back
+                self._release(cls)
+            else:
+                waiter.future.cancel()
+                self._waiters.remove(waiter)
+                cls.queued -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                cls.rejected += 1
+                raise Overloaded(cls.name, self._retry_after(cls)) from None
+            raise
+
+    def _release(self, cls: EndpointClass):
+        self._in_flight -= 1
+        cls.in_flight -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, name: str) -> AsyncIterator[None]:
+        """Holds one browser-session slot of the given endpoint class"""
+        cls = self.classes.get(name) or self.classes["stats"]
+        with phase("admission_wait"):
+            await self._acquire(cls)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            cls.observe(time.monotonic() - started)
+            self._release(cls)
+
+    def foreground_load(self) -> float:
+        """Session slots used or wanted by non-background classes, as a share of the cap"""
+        busy = sum(c.in_flight + c.queued for c in self.classes.values() if c.name != "background")
+        return busy / max(self.max_sessions, 1)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inFlight": self._in_flight,
+            "maxSessions": self.max_sessions,
+            "classes": {
+                c.name: {
+                    "priority": c.priority,
+                    "inFlight": c.in_flight,
+                    "queued": c.queued,
+                    "maxConcurrent": c.max_concurrent,
+                    "maxQueue": c.max_queue,
+                    "admitted": c.admitted,
+                    "rejected": c.rejected,
+                    "avgDurationMs": round(c.avg_duration * 1000, 1),
+                }
+                for c in self.classes.values()
+            },
+        }
@@ -0,0 +1,186 @@
+"""
+Cold-start benchmark for new API replicas.
+
+Measures what a freshly started replica costs before it serves its first
+browser scrape, against the GFG stub and a local headless Chromium (or
+--browser-url):
+
+- import: seconds to `import main`, and whether that loaded Playwright;
+- per startup mode, averaged over --trials fresh uvicorn processes:
+  listen (first 200 from /), ready (first 200 from /ready), the first
+  browser scrape sent right after /ready, and a second scrape for another
+  user once the first is done, for comparison.
+
+"lazy" starts without warm-up (BROWSER_WARMUP=0), so the first scrape
+pays for the Playwright driver, the CDP connect and context creation.
+"warm" connects and fills the pool in the lifespan, and /ready waits for it.
+
+    python bench/cold_start.py --trials 3
+    python bench/cold_start.py --trials 3 --save cold-start
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from gfg_stub import GFGStub
+from run import REPO_ROOT, _free_port, _git_revision, _stop, launch_chromium, save_baseline
+
+
+MODES = {
+    "lazy": {"BROWSER_WARMUP": "0"},
+    "warm": {"BROWSER_WARMUP": "1"},
+}
+
+IMPORT_PROBE = (
+    "import json, sys, time\n"
+    "started = time.perf_counter()\n"
+    "import main\n"
+    "print(json.dumps({'seconds': time.perf_counter() - started,"
+    " 'playwright': 'playwright.async_api' in sys.modules}))\n"
+)
+
+
+def measure_import(runs: int) -> Dict[str, Any]:
+    samples = []
+    playwright = False
+    for _ in range(runs):
+        out = subprocess.check_output([sys.executable, "-c", IMPORT_PROBE], cwd=REPO_ROOT, text=True,
+                                      env={**os.environ, "HISTORY_DB": ""})
+        result = json.loads(out.strip().splitlines()[-1])
+        samples.append(result["seconds"])
+        playwright = playwright or result["playwright"]
+    return {"medianMs": round(statistics.median(samples) * 1000, 1), "loadsPlaywright": playwright}
+
+
+def _poll(client: httpx.Client, path: str, deadline: float, process: subprocess.Popen) -> float:
+    """Seconds on the monotonic clock at which path first answered 200"""
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API exited with code {process.returncode}")
+        try:
+            if client.get(path, timeout=1).status_code == 200:
+                return time.monotonic()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.02)
+    raise RuntimeError(f"Timed out waiting for {path}")
+
+
+def _timed_get(client: httpx.Client, path: str, timeout: float) -> float:
+    started = time.monotonic()
+    response = client.get(path, timeout=timeout)
+    if response.status_code != 200:
+        raise RuntimeError(f"{path} answered {response.status_code}: {response.text[:200]}")
+    return (time.monotonic() - started) * 1000
+
+
+def start_replica(workdir: str, env: Dict[str, str], trial: str, timeout: float) -> Dict[str, float]:
+    port = _free_port()
+    log = open(os.path.join(workdir, f"api-{trial}.log"), "w")
+    started = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=REPO_ROOT,
+        env={**os.environ, **env},
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            deadline = started + timeout
+            listen = _poll(client, "/", deadline, process)
+            ready = _poll(client, "/ready", deadline, process)
+            first = _timed_get(client, f"/stats/{trial}-first", timeout)
+            second = _timed_get(client, f"/stats/{trial}-second", timeout)
+    finally:
+        _stop(process)
+        log.close()
+    return {
+        "listenMs": (listen - started) * 1000,
+        "readyMs": (ready - started) * 1000,
+        "firstScrapeMs": first,
+        "secondScrapeMs": second,
+        # What a client behind a readiness-gated load balancer waits for, from process start
+        "firstResponseMs": (ready - started) * 1000 + first,
+    }
+
+
+def print_report(imports: Dict[str, Any], results: Dict[str, Dict[str, float]]):
+    print(f"\nimport main: {imports['medianMs']} ms (Playwright loaded: {imports['loadsPlaywright']})\n")
+    columns = ["listenMs", "readyMs", "firstScrapeMs", "secondScrapeMs", "firstResponseMs"]
+    print("mode".ljust(8) + "".join(c.rjust(17) for c in columns))
+    for mode, r in results.items():
+        print(mode.ljust(8) + "".join(f"{r[c]:17.1f}" for c in columns))
+    print("\nMeans in ms from process start (listen/ready/firstResponse) or per request (scrapes).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=3, help="Fresh API processes per mode")
+    parser.add_argument("--import-runs", type=int, default=5, help="Processes timing `import main`")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"Comma-separated subset of: {', '.join(MODES)}")
+    parser.add_argument("--latency", type=float, default=50, help="Stub response latency in ms")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds allowed per replica")
+    parser.add_argument("--browser-url", default="", help="Existing CDP endpoint instead of a local Chromium")
+    parser.add_argument("--save", metavar="NAME", help="Save results as bench/baselines/NAME.json")
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(unknown)}")
+
+    print(f"⏱️  import main x{args.import_runs}...")
+    imports = measure_import(args.import_runs)
+
+    workdir = tempfile.mkdtemp(prefix="gfg-cold-")
+    stub = GFGStub(latency_ms=args.latency).start()
+    chromium = None
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        browser_url = args.browser_url
+        if not browser_url:
+            chromium, browser_url = launch_chromium(workdir)
+        base_env = {
+            "GFG_BASE_URL": stub.base_url,
+            "BROWSER_URL": browser_url,
+            "HTTP_FAST_PATH": "0",  # every scrape takes the browser path being measured
+            "REFRESH_ENABLED": "0",
+            "CACHE_DIR": "",
+            "HISTORY_DB": "",
+        }
+        for mode in modes:
+            trials: List[Dict[str, float]] = []
+            for i in range(args.trials):
+                print(f"⏱️  {mode}: replica {i + 1}/{args.trials}...")
+                trials.append(start_replica(workdir, {**base_env, **MODES[mode]}, f"{mode}{i}", args.timeout))
+            results[mode] = {key: round(statistics.mean(t[key] for t in trials), 1) for key in trials[0]}
+    finally:
+        _stop(chromium)
+        stub.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(imports, results)
+    if args.save:
+        save_baseline(args.save, {
+            "revision": _git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "config": {k: v for k, v in vars(args).items() if k != "save"},
+            "import": imports,
+            "results": results,
+        })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Local stand-in for the GeeksforGeeks profile pages.
+
+Serves /profile/<username> and /profile/<username>?tab=activity with the same
+NewProfile_*, ScoreContainer_*, ProblemNavbar_* and SolvedProblemsContainer_*
+markup the scrapers read, so the API can be benchmarked against a local
+Chromium without touching the live site. Every user renders deterministically
+from its name; usernames starting with "ghost" redirect to the login page the
+way private and deleted profiles do.
+
+    python bench/gfg_stub.py --port 8765 --latency 50 --problems 200
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+
+DIFFICULTIES = ["School", "Basic", "Easy", "Medium", "Hard"]
+# Share of --problems per difficulty, so the lists have realistic proportions
+DIFFICULTY_WEIGHTS = {"School": 0.1, "Basic": 0.2, "Easy": 0.35, "Medium": 0.3, "Hard": 0.05}
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{username} | GeeksforGeeks Profile</title>
+</head>
+<body>
+<div class="NewProfile_profile__header">
+  <div class="NewProfile_name__N_Nlw">{full_name}</div>
+  <div class="NewProfile_designation__fujtZ">{designation}</div>
+</div>
+<div class="ScoreContainer_score__container">
+{score_cards}
+</div>
+<div class="ProblemNavbar_head__6ptDV">
+{nav_items}
+</div>
+<div class="SolvedProblemsContainer_container" id="solved"></div>
+<script id="__NEXT_DATA__" type="application/json">{next_data}</script>
+<script>
+  const PROBLEMS = {problems_json};
+  document.querySelectorAll(".ProblemNavbar_head_nav__OqbEt").forEach((tab) => {{
+    tab.addEventListener("click", () => {{
+      const list = document.createElement("ul");
+      list.className = "SolvedProblemsContainer_problemList__8Ua09";
+      for (const p of PROBLEMS[tab.dataset.difficulty]) {{
+        const li = document.createElement("li");
+        const a = document.createElement("a");
+        a.href = p.questionUrl;
+        a.textContent = p.question;
+        li.appendChild(a);
+        list.appendChild(li);
+      }}
+      document.getElementById("solved").replaceChildren(list);
+    }});
+  }});
+</script>
+</body>
+</html>
+"""
+
+SCORE_CARD_TEMPLATE = """  <div class="ScoreContainer_score-card__zI4vG">
+    <div class="ScoreContainer_label__aVpLE">{label}</div>
+    <div class="ScoreContainer_value__7yy7h">{value}</div>
+  </div>"""
+
+NAV_ITEM_TEMPLATE = """  <div class="ProblemNavbar_head_nav__OqbEt" data-difficulty="{name}">{upper} ({count})</div>"""
+
+
+def _seed(username: str) -> int:
+    return int(hashlib.sha1(username.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def user_fixture(username: str, problems: int) -> Dict[str, Any]:
+    """Deterministic profile, counts and problem lists for a username"""
+    seed = _seed(username)
+    # +/-25% around --problems so users differ but the total stays predictable
+    total = max(0, int(problems * (0.75 + (seed % 51) / 100)))
+    lists: Dict[str, List[Dict[str, str]]] = {}
+    for name in DIFFICULTIES:
+        count = int(total * DIFFICULTY_WEIGHTS[name])
+        lists[name] = [
+            {
+                "question": f"{name} Problem {i + 1}",
+                "questionUrl": f"https://www.geeksforgeeks.org/problems/{name.lower()}-problem-{i + 1}/1",
+            }
+            for i in range(count)
+        ]
+    solved = sum(len(v) for v in lists.values())
+    return {
+        "fullName": f"Bench User {username}",
+        "designation": "Student" if seed % 2 else "",
+        "codingScore": solved * 2 + seed % 100,
+        "problemsSolved": solved,
+        "instituteRank": 0 if seed % 3 == 0 else seed % 5000,
+        "articlesPublished": seed % 7,
+        "potdStreak": seed % 30,
+        "longestStreak": 30 + seed % 60,
+        "potdsSolved": 30 + seed % 300,
+        "problems": lists,
+    }
+
+
+def render_page(username: str, problems: int) -> str:
+    user = user_fixture(username, problems)
+    cards = [
+        ("Coding Score", user["codingScore"]),
+        ("Problems Solved", user["problemsSolved"]),
+        ("Institute Rank", user["instituteRank"] or "__"),
+        ("Articles Published", user["articlesPublished"]),
+    ]
+    next_data = {
+        "props": {"pageProps": {"userInfo": {
+            "name": user["fullName"],
+            "designation": user["designation"],
+            "score": user["codingScore"],
+            "total_problems_solved": user["problemsSolved"],
+            "institute_rank": user["instituteRank"],
+            "article_count": user["articlesPublished"],
+            "pod_solved_current_streak": user["potdStreak"],
+            "pod_solved_longest_streak": user["longestStreak"],
+            "pod_correct_submissions_count": user["potdsSolved"],
+        }}}
+    }
+    return PAGE_TEMPLATE.format(
+        username=html.escape(username),
+        full_name=html.escape(user["fullName"]),
+        designation=html.escape(user["designation"]),
+        score_cards="\n".join(SCORE_CARD_TEMPLATE.format(label=l, value=v) for l, v in cards),
+        nav_items="\n".join(
+            NAV_ITEM_TEMPLATE.format(name=n, upper=n.upper(), count=len(user["problems"][n]))
+            for n in DIFFICULTIES
+        ),
+        next_data=json.dumps(next_data).replace("</", "<\\/"),
+        problems_json=json.dumps(user["problems"]).replace("</", "<\\/"),
+    )
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "GFGStub"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes = b"", content_type: str = "text/html; charset=utf-8",
+              headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.server.count()
+
+        if parts.path.startswith("/auth"):
+            return self._send(200, b"<html><body>Login</body></html>")
+
+        segments = [s for s in parts.path.split("/") if s]
+        if len(segments) != 2 or segments[0] != "profile":
+            return self._send(404, b"Not found", "text/plain")
+
+        username = segments[1]
+        if username.startswith("ghost"):
+            return self._send(302, headers={"Location": f"/auth?redirect=/profile/{username}"})
+
+        # The real profile renders the header and the activity navbar on both tabs
+        self._send(200, render_page(username, self.server.problems).encode("utf-8"))
+
+
+class GFGStub(ThreadingHTTPServer):
+    """Threaded fixture server with a fixed per-request latency"""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0,
+                 problems: int = 100):
+        super().__init__((host, port), _Handler)
+        self.latency = latency_ms / 1000
+        self.problems = problems
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/profile"
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    def start(self) -> "GFGStub":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0, help="Milliseconds added to every response")
+    parser.add_argument("--problems", type=int, default=100, help="Approximate solved problems per user")
+    args = parser.parse_args()
+
+    stub = GFGStub(args.host, args.port, args.latency, args.problems)
+    print(f"🧪 GFG stub serving {stub.base_url}/<username>")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
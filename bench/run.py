@@ -0,0 +1,361 @@
+"""
+Offline benchmark and load test for the API.
+
+Starts the GFG stub (bench/gfg_stub.py), a local headless Chromium exposing
+CDP, and the API under uvicorn pointed at both through GFG_BASE_URL and
+BROWSER_URL. It then drives each endpoint at the given concurrency and
+reports throughput, latency percentiles and browser sessions opened (read
+from the API's /metrics). Results can be saved as a named baseline and
+compared against a previous one, so regressions show up between commits.
+
+    python bench/run.py --concurrency 8 --requests 200 --save before
+    python bench/run.py --concurrency 8 --requests 200 --compare before
+
+Chromium comes from `playwright install chromium`; pass --browser-url to use
+an already running browser (or a local Browserless container) instead.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from gfg_stub import GFGStub  # noqa: E402
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+BATCH_SIZE = 10
+
+# name: (method, path template); {u} is replaced by the username of each request
+ENDPOINTS = {
+    "profile": ("GET", "/profile/{u}"),
+    "stats": ("GET", "/stats/{u}"),
+    "stats_svg": ("GET", "/stats/{u}?format=svg"),
+    "badge": ("GET", "/{u}"),
+    "problems": ("GET", "/problems/{u}"),
+    "problems_stream": ("GET", "/problems/{u}?stream=ndjson"),
+    "user": ("GET", "/user/{u}?problems=true"),
+    "stats_batch": ("POST", "/stats/batch"),
+    "profile_batch": ("POST", "/profile/batch"),
+    "not_found": ("GET", "/profile/ghost-{u}"),
+}
+
+# Counters read from /metrics before and after each endpoint run
+SESSION_METRICS = {
+    "sessionsOpened": 'gfg_scrape_phase_seconds_count{phase="new_context"}',
+    "browserScrapes": 'gfg_scrape_phase_seconds_count{phase="pool_checkout"}',
+    "httpFetches": 'gfg_scrape_phase_seconds_count{phase="http_fetch"}',
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(url: str, timeout: float, process: Optional[subprocess.Popen] = None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} before becoming ready")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# --- Processes under test ---
+
+def launch_chromium(workdir: str) -> Tuple[subprocess.Popen, str]:
+    """Starts a headless Chromium with remote debugging, returning it and its CDP URL"""
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        executable = p.chromium.executable_path
+    if not os.path.exists(executable):
+        raise RuntimeError("Chromium not found; run `playwright install chromium` or pass --browser-url")
+
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            executable,
+            "--headless=new",
+            f"--remote-debugging-port={port}",
+            f"--user-data-dir={os.path.join(workdir, 'chromium')}",
+            "--no-sandbox",
+            "--no-first-run",
+            "--disable-gpu",
+            "--disable-dev-shm-usage",
+            "about:blank",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    _wait_for(f"{url}/json/version", 30, process)
+    return process, url
+
+
+def launch_api(workdir: str, env: Dict[str, str]) -> Tuple[subprocess.Popen, str]:
+    """Starts the API under uvicorn with the benchmark environment"""
+    port = _free_port()
+    log = open(os.path.join(workdir, "api.log"), "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=REPO_ROOT,
+        env={**os.environ, **env},
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    url = f"http://127.0.0.1:{port}"
+    _wait_for(f"{url}/", 60, process)
+    return process, url
+
+
+def _stop(process: Optional[subprocess.Popen]):
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# --- Load generation ---
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+async def _read_counters(client: httpx.AsyncClient) -> Dict[str, float]:
+    text = (await client.get("/metrics")).text
+    counters = {}
+    for name, series in SESSION_METRICS.items():
+        match = re.search(re.escape(series) + r" ([0-9.e+]+)", text)
+        counters[name] = float(match.group(1)) if match else 0.0
+    return counters
+
+
+async def run_endpoint(client: httpx.AsyncClient, name: str, requests: int, concurrency: int,
+                       users: int, stub: GFGStub) -> Dict[str, Any]:
+    method, template = ENDPOINTS[name]
+    queue: "asyncio.Queue[int]" = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+
+    async def worker():
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            # Users are namespaced per endpoint so one run never warms another's cache
+            username = f"{name}-user{i % users}"
+            started = time.perf_counter()
+            try:
+                if method == "POST":
+                    body = {"usernames": [f"{name}-user{(i * BATCH_SIZE + j) % users}" for j in range(BATCH_SIZE)]}
+                    response = await client.post(template, json=body)
+                else:
+                    response = await client.get(template.format(u=username))
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    before = await _read_counters(client)
+    stub_before = stub.requests
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    after = await _read_counters(client)
+
+    latencies.sort()
+    expected = "404" if name == "not_found" else "200"
+    return {
+        "requests": requests,
+        "errors": sum(n for status, n in statuses.items() if status != expected),
+        "statuses": statuses,
+        "seconds": round(elapsed, 3),
+        "throughput": round(requests / elapsed, 2) if elapsed else 0.0,
+        "meanMs": round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+        "p50Ms": round(_percentile(latencies, 50), 1),
+        "p95Ms": round(_percentile(latencies, 95), 1),
+        "p99Ms": round(_percentile(latencies, 99), 1),
+        "maxMs": round(latencies[-1], 1) if latencies else 0.0,
+        **{key: int(after[key] - before[key]) for key in SESSION_METRICS},
+        "upstreamRequests": stub.requests - stub_before,
+    }
+
+
+async def drive(api_url: str, endpoints: List[str], args, stub: GFGStub) -> Dict[str, Dict[str, Any]]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=api_url, timeout=args.timeout, limits=limits) as client:
+        results = {}
+        for name in endpoints:
+            print(f"⏱️  {name}: {args.requests} requests at concurrency {args.concurrency}...")
+            results[name] = await run_endpoint(client, name, args.requests, args.concurrency, args.users, stub)
+        return results
+
+
+# --- Reporting ---
+
+COLUMNS = [
+    ("endpoint", 16), ("req/s", 8), ("p50", 8), ("p95", 8), ("p99", 8),
+    ("errors", 7), ("sessions", 9), ("scrapes", 8), ("http", 6),
+]
+
+
+def print_report(results: Dict[str, Dict[str, Any]]):
+    print()
+    print(" ".join(title.rjust(width) if i else title.ljust(width) for i, (title, width) in enumerate(COLUMNS)))
+    for name, r in results.items():
+        row = [name, r["throughput"], r["p50Ms"], r["p95Ms"], r["p99Ms"], r["errors"],
+               r["sessionsOpened"], r["browserScrapes"], r["httpFetches"]]
+        print(" ".join(
+            str(value).rjust(width) if i else str(value).ljust(width)
+            for i, (value, (_, width)) in enumerate(zip(row, COLUMNS))
+        ))
+    print("\nLatencies in ms; sessions = browser contexts created, scrapes = pooled page checkouts.")
+
+
+def _baseline_path(name: str) -> str:
+    return name if name.endswith(".json") else os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def save_baseline(name: str, report: Dict[str, Any]):
+    path = _baseline_path(name)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Saved baseline to {path}")
+
+
+def compare_baseline(name: str, results: Dict[str, Dict[str, Any]], threshold: float) -> bool:
+    """Prints deltas against a saved baseline; True if any endpoint regressed past the threshold"""
+    with open(_baseline_path(name), "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\n📊 Compared with {name} ({baseline.get('revision', 'unknown')}):")
+
+    regressed = False
+    for endpoint, current in results.items():
+        previous = baseline["results"].get(endpoint)
+        if previous is None:
+            continue
+        notes = []
+        for key, higher_is_worse in (("p50Ms", True), ("p95Ms", True), ("p99Ms", True), ("throughput", False)):
+            old, new = previous[key], current[key]
+            if not old:
+                continue
+            change = (new - old) / old * 100
+            notes.append(f"{key} {old}→{new} ({change:+.1f}%)")
+            if (change if higher_is_worse else -change) > threshold and key in ("p95Ms", "throughput"):
+                regressed = True
+                notes[-1] += " ⚠️"
+        if previous.get("sessionsOpened") != current["sessionsOpened"]:
+            notes.append(f"sessions {previous.get('sessionsOpened')}→{current['sessionsOpened']}")
+        print(f"  {endpoint:<16} " + ", ".join(notes))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS),
+                        help=f"Comma-separated subset of: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--users", type=int, default=50, help="Distinct usernames per endpoint (cache hit ratio)")
+    parser.add_argument("--latency", type=float, default=50, help="Stub response latency in ms")
+    parser.add_argument("--problems", type=int, default=200, help="Approximate solved problems per stub user")
+    parser.add_argument("--timeout", type=float, default=120, help="Client timeout per request in seconds")
+    parser.add_argument("--browser-url", default="", help="Existing CDP endpoint instead of a local Chromium")
+    parser.add_argument("--no-fast-path", action="store_true", help="Force every scrape through the browser")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the API process (repeatable)")
+    parser.add_argument("--save", metavar="NAME", help="Save results as bench/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="Compare with a saved baseline")
+    parser.add_argument("--threshold", type=float, default=10, help="Regression threshold in percent")
+    args = parser.parse_args()
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = [e for e in endpoints if e not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix="gfg-bench-")
+    stub = GFGStub(latency_ms=args.latency, problems=args.problems).start()
+    chromium = api = None
+    try:
+        browser_url = args.browser_url
+        if not browser_url:
+            chromium, browser_url = launch_chromium(workdir)
+        env = {
+            "GFG_BASE_URL": stub.base_url,
+            "BROWSER_URL": browser_url,
+            "HTTP_FAST_PATH": "0" if args.no_fast_path else "1",
+            "REFRESH_ENABLED": "0",
+            "CACHE_DIR": "",
+            # Fresh per run, so no state carries over into the next run's numbers
+            "HISTORY_DB": os.path.join(workdir, "history.db"),
+        }
+        env.update(kv.split("=", 1) for kv in args.env)
+        print(f"🧪 Stub at {stub.base_url}, browser at {browser_url}")
+        api, api_url = launch_api(workdir, env)
+
+        results = asyncio.run(drive(api_url, endpoints, args, stub))
+    finally:
+        _stop(api)
+        _stop(chromium)
+        stub.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    report = {
+        "revision": _git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {k: v for k, v in vars(args).items() if k not in ("save", "compare")},
+        "results": results,
+    }
+    if args.save:
+        save_baseline(args.save, report)
+    if args.compare and compare_baseline(args.compare, results, args.threshold):
+        print(f"\n❌ Regression above {args.threshold}% threshold")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Result cache for the scraper functions.
+
+Entries live in a bounded in-memory LRU and, when CACHE_DIR is set, in an
+on-disk tier (one JSON file per key) that survives restarts. A cached value
+is served fresh until its per-kind TTL expires; after that it is served
+stale while a background refresh runs, until CACHE_STALE_TTL has also passed.
+Files past that window are deleted when read, and by a sweep of the
+directory every CACHE_SWEEP_INTERVAL for keys nobody reads again.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+import fastjson
+
+
+# Configuration
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "2048"))
+CACHE_DIR = os.environ.get("CACHE_DIR", "")
+CACHE_STALE_TTL = int(os.environ.get("CACHE_STALE_TTL", "86400"))
+CACHE_SWEEP_INTERVAL = int(os.environ.get("CACHE_SWEEP_INTERVAL", "3600"))
+CACHE_TTLS = {
+    "stats": int(os.environ.get("CACHE_TTL_STATS", "3600")),
+    "profile": int(os.environ.get("CACHE_TTL_PROFILE", "3600")),
+    "problems": int(os.environ.get("CACHE_TTL_PROBLEMS", "21600")),
+}
+
+Fetcher = Callable[[], Awaitable[Dict[str, Any]]]
+
+# True inside stale-while-revalidate refresh tasks, so their scrapes can be deprioritised
+IN_BACKGROUND_REFRESH: ContextVar[bool] = ContextVar("in_background_refresh", default=False)
+
+
+@dataclass
+class CacheEntry:
+    value: Dict[str, Any]
+    stored_at: float
+    expires_at: float
+    stale_until: float
+    encoded: Optional[bytes] = field(default=None, repr=False, compare=False)  # memory tier only
+
+    def json(self) -> bytes:
+        """The value as JSON, encoded on first use and kept with the entry"""
+        if self.encoded is None:
+            self.encoded = fastjson.dumps(self.value)
+        return self.encoded
+
+    def is_fresh(self, now: float) -> bool:
+        return now < self.expires_at
+
+    def is_usable(self, now: float) -> bool:
+        return now < self.stale_until
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used key"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        if key not in self._data:
+            return None
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def set(self, key: str, value: Any):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def pop(self, key: str) -> Optional[Any]:
+        return self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class DiskCache:
+    """One JSON file per key, written atomically"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def load(self, key: str) -> Optional[CacheEntry]:
+        """The stored entry; files past their stale window are deleted instead"""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = CacheEntry(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+        if not entry.is_usable(time.time()):
+            self._remove(path)
+            return None
+        return entry
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def sweep(self, max_age: float) -> int:
+        """Deletes files written more than max_age seconds ago, so keys never read again do not pile up"""
+        cutoff = time.time() - max_age
+        removed = 0
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        self._remove(entry.path)
+                        removed += 1
+        except OSError as e:
+            print(f"⚠️ Could not sweep cache directory {self.directory}: {e}")
+        return removed
+
+    def store(self, key: str, entry: CacheEntry):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        data = asdict(entry)
+        del data["encoded"]
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not write cache file for {key}: {e}")
+
+
+class ResultCache:
+    """Two-tier scrape result cache with stale-while-revalidate"""
+
+    def __init__(
+        self,
+        ttls: Dict[str, int] = CACHE_TTLS,
+        stale_ttl: int = CACHE_STALE_TTL,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        directory: str = CACHE_DIR,
+    ):
+        self.ttls = ttls
+        self.stale_ttl = stale_ttl
+        self._memory = LRUCache(max_entries)
+        self._disk = DiskCache(directory) if directory else None
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._swept_at = time.time()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(kind: str, username: str) -> str:
+        return f"{kind}:{username}"
+
+    async def lookup(self, kind: str, username: str) -> Optional[CacheEntry]:
+        """Returns the entry from memory, falling back to (and promoting from) disk"""
+        key = self.key(kind, username)
+        entry = self._memory.get(key)
+        if entry is None and self._disk:
+            entry = await asyncio.to_thread(self._disk.load, key)
+            if entry is not None:
+                self._memory.set(key, entry)
+        return entry
+
+    async def store(self, kind: str, username: str, value: Dict[str, Any]):
+        """Caches a successful result; error results are never stored"""
+        if "error" in value:
+            return
+        now = time.time()
+        ttl = self.ttls.get(kind, 3600)
+        entry = CacheEntry(
+            value=value,
+            stored_at=now,
+            expires_at=now + ttl,
+            stale_until=now + ttl + self.stale_ttl,
+        )
+        key = self.key(kind, username)
+        self._memory.set(key, entry)
+        if self._disk:
+            await asyncio.to_thread(self._disk.store, key, entry)
+            if now - self._swept_at > CACHE_SWEEP_INTERVAL:
+                self._swept_at = now
+                self._start_sweep()
+
+    def _start_sweep(self):
+        # A file is past its stale window once it is older than the longest TTL plus CACHE_STALE_TTL
+        max_age = max(self.ttls.values(), default=3600) + self.stale_ttl
+        task = asyncio.create_task(asyncio.to_thread(self._disk.sweep, max_age))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def get_or_fetch(self, kind: str, username: str, fetch: Fetcher) -> Dict[str, Any]:
+        """Serves from cache when possible, otherwise awaits fetch().
+
+        fetch() stores its own result, so callers that share one coalesced
+        fetch write the entry once instead of once per caller.
+        """
+        now = time.time()
+        entry = await self.lookup(kind, username)
+
+        if entry is not None and entry.is_fresh(now):
+            self.hits += 1
+            return entry.value
+
+        if entry is not None and entry.is_usable(now):
+            self.stale_hits += 1
+            self._schedule_refresh(kind, username, fetch)
+            return entry.value
+
+        self.misses += 1
+        return await fetch()
+
+    def _schedule_refresh(self, kind: str, username: str, fetch: Fetcher):
+        key = self.key(kind, username)
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def refresh():
+            IN_BACKGROUND_REFRESH.set(True)
+            try:
+                await fetch()
+            except Exception as e:
+                print(f"⚠️ Background refresh failed for {key}: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.create_task(refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._memory),
+            "hits": self.hits,
+            "staleHits": self.stale_hits,
+            "misses": self.misses,
+            "refreshing": len(self._refreshing),
+        }
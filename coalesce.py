@@ -0,0 +1,125 @@
+"""
+In-process request coalescing ("single-flight").
+
+Concurrent callers asking for the same key share one in-flight call and
+receive its result or exception, so a burst of requests for one username
+opens a single browser session instead of one per request. A flight that
+produces its result in chunks can hand them to streaming callers through a
+Broadcast as they arrive.
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional
+
+
+@dataclass
+class Flight:
+    key: str
+    task: asyncio.Task
+    started_at: float = field(default_factory=time.monotonic)
+    waiters: int = 1
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time and fans the outcome out to all waiters"""
+
+    def __init__(self, history_size: int = 100):
+        self._flights: Dict[str, Flight] = {}
+        self._history: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+        self.flights = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        return await asyncio.shield(self.start(key, fn))
+
+    def start(self, key: str, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Joins the flight for key, starting fn() if there is none; await the task through asyncio.shield"""
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight.waiters += 1
+            self.coalesced += 1
+        else:
+            # The call runs in its own task so a disconnecting caller cannot cancel it for the others
+            flight = Flight(key=key, task=asyncio.create_task(fn()))
+            self._flights[key] = flight
+            self.flights += 1
+            flight.task.add_done_callback(lambda _: self._finish(flight))
+        return flight.task
+
+    def _finish(self, flight: Flight):
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+        if not flight.task.cancelled():
+            # Mark the exception retrieved; every waiter has already been handed it
+            flight.task.exception()
+        self._record(flight)
+
+    def _record(self, flight: Flight):
+        duration = time.monotonic() - flight.started_at
+        self._history.append({
+            "key": flight.key,
+            "waiters": flight.waiters,
+            "durationMs": round(duration * 1000, 1),
+        })
+        if flight.waiters > 1:
+            print(f"🔗 Coalesced {flight.waiters} callers onto one scrape for {flight.key}")
+
+    def in_flight(self) -> List[str]:
+        return list(self._flights)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inFlight": len(self._flights),
+            "flights": self.flights,
+            "coalesced": self.coalesced,
+            "recent": list(self._history),
+        }
+
+
+class Broadcast:
+    """Chunks of one in-flight call, fanned out to subscribers as they are produced.
+
+    Each subscriber reads from its own unbounded queue, so the producer never
+    waits for a slow reader. Late subscribers get the chunks so far first.
+    """
+
+    _END = object()
+
+    def __init__(self):
+        self._chunks: List[Any] = []
+        self._queues: List[asyncio.Queue] = []
+        self._error: Optional[BaseException] = None
+        self.closed = False
+
+    def publish(self, chunk: Any):
+        self._chunks.append(chunk)
+        for queue in self._queues:
+            queue.put_nowait(chunk)
+
+    def close(self, error: Optional[BaseException] = None):
+        """Ends every subscription; error, if given, is raised to the subscribers"""
+        self._error = error
+        self.closed = True
+        for queue in self._queues:
+            queue.put_nowait(self._END)
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        queue: asyncio.Queue = asyncio.Queue()
+        for chunk in self._chunks:
+            queue.put_nowait(chunk)
+        if self.closed:
+            queue.put_nowait(self._END)
+        self._queues.append(queue)
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is self._END:
+                    break
+                yield chunk
+        finally:
+            self._queues.remove(queue)
+        if self._error is not None:
+            raise self._error
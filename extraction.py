@@ -0,0 +1,195 @@
+"""
+Declarative page extraction.
+
+Scrapers describe what they read as data (selectors, which property to
+read, how to parse it) and an ExtractionSpec runs the whole description in
+one page.evaluate call. Every locator.count() / text_content() used to be a
+separate CDP round-trip to Browserless, so a profile page cost a dozen or
+more; a spec costs one. Number parsing and the "__" placeholder GFG shows
+for empty score cards are handled in the page, and a GFG redesign becomes
+an edit to the specs declared in specs.py rather than to scraper code.
+The same spec can also be run over server-rendered HTML with BeautifulSoup,
+which is how the browserless fast path reads pages.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, Union
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup, Tag
+    from playwright.async_api import Page
+
+
+@dataclass(frozen=True)
+class Field:
+    """One value read from the first element matching selector.
+
+    An empty selector reads the element the spec is applied to (the
+    document, or the current item of a ListOf). attr is a DOM property such
+    as textContent, innerText or href, falling back to getAttribute. parse is
+    "text" (trimmed string), "int" (digits and commas only, anything else
+    such as "__" gives the default), "count" (the first "(n)" in the text)
+    or "counts" (every "(n)" in the text, as a list). A missing element
+    gives the default.
+    """
+    selector: str = ""
+    attr: str = "textContent"
+    parse: str = "text"
+    default: Any = None
+
+    def compile(self) -> Dict[str, Any]:
+        return {"kind": "field", "selector": self.selector, "attr": self.attr,
+                "parse": self.parse, "default": self.default}
+
+
+@dataclass(frozen=True)
+class ListOf:
+    """Applies fields to every element matching selector, giving a list of dicts"""
+    selector: str
+    fields: Dict[str, "Rule"]
+
+    def compile(self) -> Dict[str, Any]:
+        return {"kind": "list", "selector": self.selector, "fields": _compile_fields(self.fields)}
+
+
+@dataclass(frozen=True)
+class Labelled:
+    """Repeated label/value cards, keyed by output name.
+
+    Each element matching selector is a card; the first entry of labels
+    whose text occurs in the card's label picks the output name for its
+    value. Cards with an unknown label or an unparseable value are skipped.
+    """
+    selector: str
+    label: Field
+    value: Field
+    labels: Dict[str, str] = field(default_factory=dict)
+
+    def compile(self) -> Dict[str, Any]:
+        return {"kind": "labelled", "selector": self.selector, "label": self.label.compile(),
+                "value": self.value.compile(), "labels": self.labels}
+
+
+Rule = Union[Field, ListOf, Labelled]
+
+
+def _compile_fields(fields: Dict[str, Rule]) -> Dict[str, Any]:
+    return {name: rule.compile() for name, rule in fields.items()}
+
+
+# Interprets a compiled spec in the page; the spec is passed as the argument
+_EXTRACT_SCRIPT = """
+(spec) => {
+    const read = (root, f) => {
+        const el = f.selector ? root.querySelector(f.selector) : root;
+        if (!el) return f.default;
+        const raw = f.attr in el ? el[f.attr] : el.getAttribute(f.attr);
+        const text = raw == null ? "" : String(raw).trim();
+        if (f.parse === "int") {
+            const digits = text.replace(/,/g, "");
+            return /^\\d+$/.test(digits) ? parseInt(digits, 10) : f.default;
+        }
+        if (f.parse === "count") {
+            const m = text.match(/\\((\\d+)\\)/);
+            return m ? parseInt(m[1], 10) : f.default;
+        }
+        if (f.parse === "counts") {
+            return Array.from(text.matchAll(/\\((\\d+)\\)/g), (m) => parseInt(m[1], 10));
+        }
+        return text;
+    };
+
+    const run = (root, fields) => {
+        const out = {};
+        for (const [name, f] of Object.entries(fields)) {
+            if (f.kind === "list") {
+                out[name] = Array.from(root.querySelectorAll(f.selector), (el) => run(el, f.fields));
+            } else if (f.kind === "labelled") {
+                const values = {};
+                for (const card of root.querySelectorAll(f.selector)) {
+                    const label = read(card, f.label);
+                    const key = label && Object.keys(f.labels).find((l) => label.includes(l));
+                    if (!key) continue;
+                    const value = read(card, f.value);
+                    if (value !== null && value !== undefined) values[f.labels[key]] = value;
+                }
+                out[name] = values;
+            } else {
+                out[name] = read(root, f);
+            }
+        }
+        return out;
+    };
+
+    return run(document, spec);
+}
+"""
+
+
+def _read_soup(root: "Tag", f: Dict[str, Any]) -> Any:
+    """read() from _EXTRACT_SCRIPT over parsed HTML; text properties come from get_text()"""
+    el = root.select_one(f["selector"]) if f["selector"] else root
+    if el is None:
+        return f["default"]
+    if f["attr"] == "textContent":
+        raw = el.get_text()
+    elif f["attr"] == "innerText":
+        raw = el.get_text(" ")
+    else:
+        raw = el.get(f["attr"])
+    text = "" if raw is None else str(raw).strip()
+    if f["parse"] == "int":
+        digits = text.replace(",", "")
+        return int(digits) if re.fullmatch(r"\d+", digits) else f["default"]
+    if f["parse"] == "count":
+        m = re.search(r"\((\d+)\)", text)
+        return int(m.group(1)) if m else f["default"]
+    if f["parse"] == "counts":
+        return [int(n) for n in re.findall(r"\((\d+)\)", text)]
+    return text
+
+
+def _run_soup(root: "Tag", fields: Dict[str, Any]) -> Dict[str, Any]:
+    """run() from _EXTRACT_SCRIPT over parsed HTML"""
+    out: Dict[str, Any] = {}
+    for name, f in fields.items():
+        if f["kind"] == "list":
+            out[name] = [_run_soup(el, f["fields"]) for el in root.select(f["selector"])]
+        elif f["kind"] == "labelled":
+            values = {}
+            for card in root.select(f["selector"]):
+                label = _read_soup(card, f["label"])
+                key = label and next((l for l in f["labels"] if l in label), None)
+                if not key:
+                    continue
+                value = _read_soup(card, f["value"])
+                if value is not None:
+                    values[f["labels"][key]] = value
+            out[name] = values
+        else:
+            out[name] = _read_soup(root, f)
+    return out
+
+
+class ExtractionSpec:
+    """A named set of rules, compiled once and extracted in one round-trip"""
+
+    def __init__(self, **fields: Rule):
+        self.fields = fields
+        self._compiled = _compile_fields(fields)
+
+    async def extract(self, page: "Page") -> Dict[str, Any]:
+        return await page.evaluate(_EXTRACT_SCRIPT, self._compiled)
+
+    def extract_soup(self, soup: "BeautifulSoup") -> Dict[str, Any]:
+        """The same extraction over server-rendered HTML, without a browser.
+
+        innerText has no layout to follow here, so it is read as the text of
+        every descendant joined by spaces, and properties such as href are
+        the raw attribute rather than the resolved URL.
+        """
+        return _run_soup(soup, self._compiled)
+
+    def __repr__(self) -> str:
+        return f"ExtractionSpec({', '.join(self.fields)})"
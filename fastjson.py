@@ -0,0 +1,24 @@
+"""
+JSON encoding for trusted scraper output.
+
+Problem lists and batch results come from our own parsers and
+page.evaluate, already in the shape of the response models, so they are
+written straight to bytes instead of being rebuilt as pydantic objects and
+re-encoded by FastAPI. orjson is used when installed; otherwise the stdlib
+encoder produces the same compact UTF-8 that FastAPI's JSONResponse does.
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is always available
+    orjson = None
+
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
@@ -0,0 +1,230 @@
+"""
+Browserless fast path.
+
+The profile is a Next.js page, so the header, score cards and difficulty
+counts are usually present in the server-rendered HTML and in its
+__NEXT_DATA__ payload. These helpers fetch the page with a pooled keep-alive
+HTTP client and parse it; they return None whenever a required field is
+missing so the caller can fall back to the Playwright scrapers.
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterable, Optional
+
+import httpx
+from bs4 import BeautifulSoup
+
+from metrics import phase
+from negative import is_login_redirect
+from specs import NEXT_DATA, PROFILE_NAME, PROFILE_SPEC, SCORE_CARD, STATS_SPEC
+
+
+# Configuration
+HTTP_FAST_PATH = os.environ.get("HTTP_FAST_PATH", "1") == "1"
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "50"))
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+DIFFICULTIES = ["School", "Basic", "Easy", "Medium", "Hard"]
+
+# The __NEXT_DATA__ keys known to carry each response field
+NEXT_DATA_FIELDS = {
+    "fullName": ("name",),
+    "designation": ("designation",),
+    "codingScore": ("score", "coding_score"),
+    "problemsSolved": ("total_problems_solved",),
+    "instituteRank": ("institute_rank",),
+    "articlesPublished": ("article_count", "total_articles_published"),
+    "potdStreak": ("pod_solved_current_streak",),
+    "longestStreak": ("pod_solved_longest_streak",),
+    "potdsSolved": ("pod_correct_submissions_count",),
+}
+# Never rendered as score cards, so these only ever come from __NEXT_DATA__
+POTD_FIELDS = ("potdStreak", "longestStreak", "potdsSolved")
+
+_CLIENT: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared client so connections to GFG are kept alive between scrapes"""
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT, "Accept": "text/html"},
+            timeout=HTTP_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=30,
+            ),
+        )
+    return _CLIENT
+
+
+async def close_http_client():
+    global _CLIENT
+    if _CLIENT is not None:
+        await _CLIENT.aclose()
+        _CLIENT = None
+
+
+async def fetch_page(url: str) -> Optional[BeautifulSoup]:
+    """Fetches and parses a profile page; None if it is unavailable or redirects to login"""
+    try:
+        with phase("http_fetch"):
+            response = await get_http_client().get(url)
+    except httpx.HTTPError as e:
+        print(f"⚠️ Fast path fetch failed for {url}: {e}")
+        return None
+    if response.status_code != 200 or is_login_redirect(str(response.url)):
+        return None
+    with phase("http_parse"):
+        return BeautifulSoup(response.text, "html.parser")
+
+
+# --- Parsing ---
+
+def _parse_int(text: Optional[str]) -> Optional[int]:
+    if text is None:
+        return None
+    text = str(text).strip().replace(",", "")
+    return int(text) if text.isdigit() else None
+
+
+def _load_next_data(text: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not text:
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def _next_data(soup: BeautifulSoup) -> Optional[Dict[str, Any]]:
+    script = soup.select_one(NEXT_DATA)
+    return _load_next_data(script.string) if script is not None else None
+
+
+def _has_value(node: Dict[str, Any], keys: Iterable[str]) -> bool:
+    return any(k in node and not isinstance(node[k], (dict, list)) for k in keys)
+
+
+def _find_user_info(payload: Any) -> Optional[Dict[str, Any]]:
+    """The one object in __NEXT_DATA__ that carries the user's profile fields together.
+
+    Keys like "name" and "score" also appear on nav items and institute
+    records, so fields are never looked up across the whole payload. The
+    object must have a name, a coding score and at least one other profile
+    field; if several do, the one with the most profile fields wins.
+    """
+    required = (NEXT_DATA_FIELDS["fullName"], NEXT_DATA_FIELDS["codingScore"])
+    others = [keys for field, keys in NEXT_DATA_FIELDS.items() if field not in ("fullName", "codingScore", "designation")]
+    best, best_score = None, 0
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if all(_has_value(node, keys) for keys in required):
+                score = sum(_has_value(node, keys) for keys in others)
+                if score > best_score:
+                    best, best_score = node, score
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return best
+
+
+def _field(info: Dict[str, Any], keys: Iterable[str]) -> Any:
+    return next((info[k] for k in keys if k in info and info[k] is not None), None)
+
+
+def _numbers(info: Dict[str, Any], fields: Iterable[str]) -> Dict[str, int]:
+    numbers = {}
+    for field in fields:
+        num = _parse_int(_field(info, NEXT_DATA_FIELDS[field]))
+        if num is not None:
+            numbers[field] = num
+    return numbers
+
+
+def parse_potd(next_data: Optional[str]) -> Dict[str, int]:
+    """POTD streaks and count from raw __NEXT_DATA__ JSON, for pages read in the browser"""
+    payload = _load_next_data(next_data)
+    info = _find_user_info(payload) if payload else None
+    return _numbers(info, POTD_FIELDS) if info is not None else {}
+
+
+def parse_profile(soup: BeautifulSoup, username: str) -> Optional[Dict[str, Any]]:
+    """Profile header and score cards, from the rendered markup or __NEXT_DATA__"""
+    data: Dict[str, Any] = {
+        "userName": username,
+        "fullName": username,
+        "designation": "",
+        "codingScore": 0,
+        "problemsSolved": 0,
+        "instituteRank": 0,
+        "articlesPublished": 0,
+        "potdStreak": 0,
+        "longestStreak": 0,
+        "potdsSolved": 0
+    }
+
+    payload = _next_data(soup)
+    info = _find_user_info(payload) if payload else None
+
+    if soup.select_one(PROFILE_NAME) is not None and soup.select_one(SCORE_CARD) is not None:
+        raw = PROFILE_SPEC.extract_soup(soup)
+        data["fullName"] = raw["fullName"] or username
+        data["designation"] = raw["designation"]
+        data.update(raw["scores"])
+        if info is not None:
+            data.update(_numbers(info, POTD_FIELDS))
+        return data
+
+    if info is None:
+        return None
+    data["fullName"] = str(_field(info, NEXT_DATA_FIELDS["fullName"]) or "").strip() or username
+    designation = _field(info, NEXT_DATA_FIELDS["designation"])
+    if designation is not None:
+        data["designation"] = str(designation).strip()
+    data.update(_numbers(info, [f for f in NEXT_DATA_FIELDS if f not in ("fullName", "designation")]))
+    return data
+
+
+def parse_stats(soup: BeautifulSoup, username: str) -> Optional[Dict[str, Any]]:
+    """Difficulty counts from the rendered problem navbar or __NEXT_DATA__"""
+    stats: Dict[str, int] = {}
+
+    numbers = STATS_SPEC.extract_soup(soup)["counts"]
+    if numbers is not None and len(numbers) >= len(DIFFICULTIES):
+        stats = {tag: numbers[i] for i, tag in enumerate(DIFFICULTIES)}
+
+    if not stats:
+        payload = _next_data(soup)
+        submissions = _find_submissions(payload) if payload else None
+        if submissions is None:
+            return None
+        stats = {tag: len(submissions.get(tag) or {}) for tag in DIFFICULTIES}
+
+    return {
+        "userName": username,
+        "totalProblemsSolved": sum(stats.values()),
+        **stats
+    }
+
+
+def _find_submissions(payload: Any) -> Optional[Dict[str, Any]]:
+    """Locates the per-difficulty solved-problem mapping inside __NEXT_DATA__"""
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            present = [tag for tag in DIFFICULTIES if tag in node]
+            if len(present) >= 2 and all(isinstance(node[tag], (dict, list)) for tag in present):
+                return node
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return None
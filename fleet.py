@@ -0,0 +1,266 @@
+"""
+Fleet of browser endpoints behind one checkout.
+
+BROWSER_URLS lists several CDP endpoints (Browserless instances, Chromium
+started with --remote-debugging-port, or "local" for an in-process headless
+Chromium), each with its own warm BrowserPool. Every scrape goes to the
+least-loaded endpoint whose circuit breaker is closed. An endpoint that
+fails BREAKER_FAILURES times in a row (failed checkouts, or a browser or
+CDP connection that closed mid-scrape; errors from the target page do not
+count) is ejected; after a cooldown a
+background probe tries to open a context on it, and it rejoins the fleet
+only if that succeeds. The cooldown doubles on every failed probe, up to
+BREAKER_MAX_COOLDOWN. While every endpoint is ejected, scrapes fail fast
+with FleetUnavailable, a 503 with Retry-After.
+"""
+
+import asyncio
+import math
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Set
+
+from admission import Overloaded
+from interception import TrafficStats
+from lazy_playwright import is_playwright_error
+from pool import BROWSER_URL, CONNECT_TIMEOUT, BrowserPool
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+
+# Configuration
+BROWSER_URLS = [u.strip() for u in os.environ.get("BROWSER_URLS", "").split(",") if u.strip()] or [BROWSER_URL]
+BREAKER_FAILURES = int(os.environ.get("BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN = float(os.environ.get("BREAKER_COOLDOWN", "15"))
+BREAKER_MAX_COOLDOWN = float(os.environ.get("BREAKER_MAX_COOLDOWN", "300"))
+BROWSER_WARMUP = os.environ.get("BROWSER_WARMUP", "1") == "1"
+WARMUP_RETRY_INTERVAL = float(os.environ.get("WARMUP_RETRY_INTERVAL", "5"))
+
+
+# Playwright error messages that mean the browser or its CDP connection broke, not the page
+BROWSER_FAILURE_MESSAGES = (
+    "Target closed",
+    "Target page, context or browser has been closed",
+    "Browser has been closed",
+    "Connection closed",
+    "ECONNREFUSED",
+    "ECONNRESET",
+)
+
+
+class FleetUnavailable(Overloaded):
+    """Raised when every endpoint's circuit breaker is open; served as a 503 like shed load"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("browser", retry_after)
+        self.args = ("No healthy browser endpoints; all circuit breakers are open",)
+
+
+def _redact(url: str) -> str:
+    return re.sub(r"(token=)[^&]+", r"\1***", url)
+
+
+def _is_browser_failure(error: Exception) -> bool:
+    # Timeouts, failed clicks and the like come from the target page, not the endpoint
+    if not is_playwright_error(error):
+        return False
+    message = str(error)
+    return any(m in message for m in BROWSER_FAILURE_MESSAGES)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with exponential cooldown"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, threshold: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN,
+                 max_cooldown: float = BREAKER_MAX_COOLDOWN):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def closed(self) -> bool:
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.cooldown = self.base_cooldown
+        self.opened_at = None
+
+    def record_failure(self) -> bool:
+        """Counts a failure; True if it just opened the breaker"""
+        self.failures += 1
+        if self.state == self.CLOSED and self.failures >= self.threshold:
+            self.state = self.OPEN
+            self.trips += 1
+            self.opened_at = time.time()
+            return True
+        return False
+
+    def probe_failed(self):
+        self.state = self.OPEN
+        self.opened_at = time.time()
+        self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+
+
+class FleetMember:
+    def __init__(self, url: str):
+        self.url = url
+        self.label = _redact(url)
+        self.pool = BrowserPool(browser_url=url)
+        self.breaker = CircuitBreaker()
+        self.routed = 0
+        self.warm = False
+        self.last_error: Optional[str] = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "endpoint": self.label,
+            "state": self.breaker.state,
+            "warm": self.warm,
+            "consecutiveFailures": self.breaker.failures,
+            "trips": self.breaker.trips,
+            "cooldown": self.breaker.cooldown if not self.breaker.closed else None,
+            "openedAt": self.breaker.opened_at,
+            "inUse": self.pool.in_use,
+            "waiting": self.pool.waiting,
+            "load": round(self.pool.load(), 2),
+            "routed": self.routed,
+            "connects": self.pool.connects,
+            "lastError": self.last_error,
+        }
+
+
+class BrowserFleet:
+    """Least-loaded routing over per-endpoint pools, with circuit breaking"""
+
+    def __init__(self, urls: List[str] = BROWSER_URLS):
+        self.members = [FleetMember(url) for url in urls]
+        self._tasks: Set[asyncio.Task] = set()
+
+    # Aggregates read by /metrics
+    @property
+    def connects(self) -> int:
+        return sum(m.pool.connects for m in self.members)
+
+    @property
+    def recycled(self) -> int:
+        return sum(m.pool.recycled for m in self.members)
+
+    @property
+    def in_use(self) -> int:
+        return sum(m.pool.in_use for m in self.members)
+
+    def has_capacity(self) -> bool:
+        """True while some healthy endpoint has a page nobody is using or waiting for"""
+        return any(m.breaker.closed and m.pool.load() < 1 for m in self.members)
+
+    def _pick(self) -> FleetMember:
+        healthy = [m for m in self.members if m.breaker.closed]
+        if not healthy:
+            raise FleetUnavailable(self._retry_after())
+        # Ties go to the member routed to least, so idle endpoints share the load
+        member = min(healthy, key=lambda m: (m.pool.load(), m.routed))
+        member.routed += 1
+        return member
+
+    def _retry_after(self) -> int:
+        """Seconds until the next probe of an ejected endpoint is due"""
+        now = time.time()
+        due = [m.breaker.opened_at + m.breaker.cooldown - now for m in self.members if m.breaker.opened_at is not None]
+        return max(1, math.ceil(min(due, default=BREAKER_COOLDOWN)))
+
+    def _failed(self, member: FleetMember, error: Exception):
+        member.last_error = str(error).splitlines()[0] if str(error) else type(error).__name__
+        if member.breaker.record_failure():
+            print(f"⚡ Circuit opened for {member.label} after {member.breaker.failures} failures")
+            task = asyncio.create_task(self._probe(member))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _probe(self, member: FleetMember):
+        """Waits out the cooldown, then lets the member back in only if a probe succeeds"""
+        while not member.breaker.closed:
+            await asyncio.sleep(member.breaker.cooldown)
+            member.breaker.state = CircuitBreaker.HALF_OPEN
+            try:
+                await asyncio.wait_for(member.pool.probe(), CONNECT_TIMEOUT / 1000)
+            except Exception as e:
+                member.last_error = str(e).splitlines()[0] if str(e) else type(e).__name__
+                member.breaker.probe_failed()
+                print(f"⚠️ Probe failed for {member.label}; next try in {member.breaker.cooldown:.0f}s")
+                continue
+            member.breaker.record_success()
+            print(f"✅ {member.label} is back in the browser fleet")
+
+    async def _warm_member(self, member: FleetMember):
+        try:
+            await asyncio.wait_for(member.pool.warm(), CONNECT_TIMEOUT / 1000)
+        except Exception as e:
+            member.last_error = str(e).splitlines()[0] if str(e) else type(e).__name__
+            print(f"⚠️ Could not warm {member.label}: {member.last_error}")
+            return
+        member.warm = True
+
+    async def warm(self):
+        """Connects every endpoint and fills its pool, retrying until at least one is warm"""
+        started = time.monotonic()
+        while True:
+            await asyncio.gather(*(self._warm_member(m) for m in self.members if not m.warm))
+            if self.ready:
+                break
+            await asyncio.sleep(WARMUP_RETRY_INTERVAL)
+        warmed = sum(m.warm for m in self.members)
+        print(f"🔥 Browser fleet warm in {time.monotonic() - started:.2f}s ({warmed}/{len(self.members)} endpoints)")
+
+    @property
+    def ready(self) -> bool:
+        """True once some healthy endpoint has been connected and filled"""
+        return any(m.warm and m.breaker.closed for m in self.members)
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator["Page"]:
+        """Checks out a warm page on the least-loaded healthy endpoint"""
+        member = self._pick()
+        checked_out = False
+        try:
+            async with member.pool.page() as page:
+                checked_out = True
+                yield page
+        except Exception as e:
+            # Any checkout failure is the endpoint's; scrape errors only if the browser broke
+            if not checked_out or _is_browser_failure(e):
+                self._failed(member, e)
+            raise
+        else:
+            member.breaker.record_success()
+
+    def traffic_stats(self) -> Dict[str, Any]:
+        """Blocked vs. allowed traffic summed over endpoints, plus recent scrapes"""
+        total = TrafficStats()
+        recent: List[Dict[str, Any]] = []
+        for member in self.members:
+            total.add(member.pool.traffic)
+            recent.extend(member.pool.recent_traffic)
+        return {"total": total.as_dict(), "recent": recent[-100:]}
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [m.status() for m in self.members]
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        for member in self.members:
+            await member.pool.close()
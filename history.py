@@ -0,0 +1,172 @@
+"""
+Snapshot store for stats and profile history.
+
+Every successful stats or profile scrape is recorded as one compact row
+(the numeric fields only) in an embedded SQLite database in WAL mode. A row
+is only written when the values differ from the user's previous snapshot,
+so a user who has not solved anything new costs no storage. The primary key
+(username, kind, ts) keeps each user's rows together on disk. A range read
+with downsampling is then one index scan answered in a few milliseconds,
+and it never touches the browser.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from cache import LRUCache
+
+
+# Configuration
+DATA_DIR = os.environ.get(
+    "DATA_DIR", os.path.join(os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share"), "gfg-profile-api")
+)
+HISTORY_DB = os.environ.get("HISTORY_DB", os.path.join(DATA_DIR, "history.db"))
+HISTORY_MAX_POINTS = int(os.environ.get("HISTORY_MAX_POINTS", "1000"))
+
+# Values tracked per kind; everything else in a result is left out of snapshots
+HISTORY_FIELDS = {
+    "stats": ("totalProblemsSolved", "School", "Basic", "Easy", "Medium", "Hard"),
+    "profile": ("codingScore", "problemsSolved", "instituteRank", "articlesPublished",
+                "potdStreak", "longestStreak", "potdsSolved"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    username TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    ts REAL NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (username, kind, ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS snapshots_ts ON snapshots (ts);
+"""
+
+
+class HistoryStore:
+    """Append-on-change snapshots with range queries and downsampling"""
+
+    def __init__(self, path: str = HISTORY_DB, latest_cache: int = 10000):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._latest = LRUCache(latest_cache)  # (kind:username) -> last recorded data
+        self.written = 0
+        self.skipped = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def snapshot(kind: str, value: Dict[str, Any]) -> str:
+        return json.dumps({f: value.get(f, 0) for f in HISTORY_FIELDS[kind]}, separators=(",", ":"))
+
+    def _record(self, kind: str, username: str, data: str, ts: float) -> bool:
+        key = f"{kind}:{username}"
+        with self._lock:
+            conn = self._connection()
+            latest = self._latest.get(key)
+            if latest is None:
+                row = conn.execute(
+                    "SELECT data FROM snapshots WHERE username = ? AND kind = ? ORDER BY ts DESC LIMIT 1",
+                    (username, kind),
+                ).fetchone()
+                latest = row[0] if row else ""
+            if latest == data:
+                self._latest.set(key, data)
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO snapshots (username, kind, ts, data) VALUES (?, ?, ?, ?)",
+                (username, kind, ts, data),
+            )
+            self._latest.set(key, data)
+            return True
+
+    async def record(self, kind: str, username: str, value: Dict[str, Any]):
+        """Stores a snapshot of a successful result unless it matches the previous one"""
+        if kind not in HISTORY_FIELDS or "error" in value:
+            return
+        try:
+            written = await asyncio.to_thread(self._record, kind, username, self.snapshot(kind, value), time.time())
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not record history for {username}: {e}")
+            return
+        if written:
+            self.written += 1
+        else:
+            self.skipped += 1
+
+    def _query(self, kind: str, username: str, since: float, until: float, points: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            conn = self._connection()
+            count, first, last = conn.execute(
+                "SELECT COUNT(*), MIN(ts), MAX(ts) FROM snapshots WHERE username = ? AND kind = ? AND ts BETWEEN ? AND ?",
+                (username, kind, since, until),
+            ).fetchone()
+            if count <= points:
+                rows = conn.execute(
+                    "SELECT ts, data FROM snapshots WHERE username = ? AND kind = ? AND ts BETWEEN ? AND ? "
+                    "ORDER BY ts",
+                    (username, kind, since, until),
+                ).fetchall()
+            else:
+                # One point per time bucket: the last snapshot in it, as the values are running totals.
+                # SQLite takes bare columns from the row that supplied MAX().
+                # Buckets span the snapshots actually in range, not an open-ended [since, until]
+                width = (last - first) / points or 1.0
+                rows = conn.execute(
+                    "SELECT MAX(ts), data FROM snapshots WHERE username = ? AND kind = ? AND ts BETWEEN ? AND ? "
+                    "GROUP BY MIN(CAST((ts - ?) / ? AS INTEGER), ?) ORDER BY 1",
+                    (username, kind, since, until, first, width, points - 1),
+                ).fetchall()
+        return [{"timestamp": round(ts), **json.loads(data)} for ts, data in rows]
+
+    def _latest_many(self, kind: str, usernames: List[str]) -> Dict[str, Dict[str, Any]]:
+        latest = {}
+        with self._lock:
+            conn = self._connection()
+            for i in range(0, len(usernames), 500):
+                chunk = usernames[i:i + 500]
+                rows = conn.execute(
+                    f"SELECT username, data, MAX(ts) FROM snapshots WHERE kind = ? "
+                    f"AND username IN ({','.join('?' * len(chunk))}) GROUP BY username",
+                    (kind, *chunk),
+                ).fetchall()
+                latest.update((username, json.loads(data)) for username, data, _ in rows)
+        return latest
+
+    def _changed(self, since: float) -> List[Tuple[str, str, float, Dict[str, Any]]]:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT kind, username, ts, data FROM snapshots WHERE ts > ? ORDER BY ts", (since,)
+            ).fetchall()
+        return [(kind, username, ts, json.loads(data)) for kind, username, ts, data in rows]
+
+    async def changed_since(self, since: float) -> List[Tuple[str, str, float, Dict[str, Any]]]:
+        """(kind, username, ts, values) of every snapshot recorded after since, by any process, oldest first"""
+        return await asyncio.to_thread(self._changed, since)
+
+    async def latest(self, kind: str, usernames: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Most recent snapshot of each given user that has one"""
+        return await asyncio.to_thread(self._latest_many, kind, usernames)
+
+    async def query(self, kind: str, username: str, since: Optional[float] = None,
+                    until: Optional[float] = None, points: int = HISTORY_MAX_POINTS) -> List[Dict[str, Any]]:
+        """Snapshots in [since, until], oldest first, downsampled to at most points entries"""
+        until = time.time() if until is None else until
+        since = 0.0 if since is None else since
+        return await asyncio.to_thread(self._query, kind, username, since, until, max(1, points))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "written": self.written, "unchanged": self.skipped}
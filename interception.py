@@ -0,0 +1,88 @@
+"""
+Request interception for pooled browser contexts.
+
+Scrapes only read the DOM, so images, media, fonts, stylesheets and
+third-party trackers are aborted before they are downloaded. Every context
+counts the requests it blocked and allowed, plus the bytes it allowed
+(blocked requests never transfer a body, so there are no bytes to count).
+"""
+
+import os
+from dataclasses import dataclass, asdict
+from typing import TYPE_CHECKING, Dict
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    from playwright.async_api import BrowserContext, Response, Route
+
+
+# Configuration
+BLOCK_RESOURCES = os.environ.get("BLOCK_RESOURCES", "1") == "1"
+BLOCKED_RESOURCE_TYPES = frozenset(
+    t.strip() for t in os.environ.get(
+        "BLOCKED_RESOURCE_TYPES", "image,media,font,stylesheet"
+    ).split(",") if t.strip()
+)
+BLOCKED_HOSTS = tuple(
+    h.strip() for h in os.environ.get(
+        "BLOCKED_HOSTS",
+        "googletagmanager.com,google-analytics.com,doubleclick.net,googlesyndication.com,"
+        "googleadservices.com,adservice.google.com,facebook.net,connect.facebook.net,"
+        "hotjar.com,clarity.ms,scorecardresearch.com,quantserve.com,taboola.com,outbrain.com,"
+        "amazon-adsystem.com,criteo.com,onesignal.com"
+    ).split(",") if h.strip()
+)
+
+
+@dataclass
+class TrafficStats:
+    allowedRequests: int = 0
+    blockedRequests: int = 0
+    allowedBytes: int = 0
+
+    def reset(self):
+        self.allowedRequests = 0
+        self.blockedRequests = 0
+        self.allowedBytes = 0
+
+    def add(self, other: "TrafficStats"):
+        self.allowedRequests += other.allowedRequests
+        self.blockedRequests += other.blockedRequests
+        self.allowedBytes += other.allowedBytes
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+def should_block(resource_type: str, url: str) -> bool:
+    if resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    host = urlsplit(url).hostname or ""
+    return any(host == blocked or host.endswith(f".{blocked}") for blocked in BLOCKED_HOSTS)
+
+
+async def install(context: "BrowserContext", stats: TrafficStats):
+    """Routes every request of the context through the block list, counting into stats"""
+
+    async def handle(route: "Route"):
+        request = route.request
+        if should_block(request.resource_type, request.url):
+            stats.blockedRequests += 1
+            await route.abort()
+        else:
+            stats.allowedRequests += 1
+            await route.continue_()
+
+    def on_request(_):
+        stats.allowedRequests += 1
+
+    def on_response(response: "Response"):
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            stats.allowedBytes += int(length)
+
+    if BLOCK_RESOURCES:
+        await context.route("**/*", handle)
+    else:
+        context.on("request", on_request)
+    context.on("response", on_response)
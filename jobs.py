@@ -0,0 +1,278 @@
+"""
+SQLite-backed scrape job queue shared by API processes and scrape workers.
+
+With SCRAPE_QUEUE set to a database path, API processes stop scraping
+themselves and submit jobs instead; worker.py owns every browser connection
+and runs them. A job is keyed by what it scrapes, so identical requests from
+any number of API processes share one queued or running job. Waiters find
+finished jobs with one batched poll per process. Jobs are claimed most
+urgent class first, and a job whose worker died is re-queued after
+JOB_TIMEOUT. The database runs in WAL mode, so readers never block the
+worker's writes.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from admission import DEFAULT_CLASSES, Overloaded
+
+
+# Configuration
+SCRAPE_QUEUE = os.environ.get("SCRAPE_QUEUE", "")
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", "16"))
+JOB_TIMEOUT = float(os.environ.get("JOB_TIMEOUT", "120"))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "0.05"))
+JOB_RESULT_TTL = float(os.environ.get("JOB_RESULT_TTL", "300"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    username TEXT NOT NULL,
+    params TEXT NOT NULL,
+    endpoint_class TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    claimed_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_key ON jobs (key) WHERE status IN ('queued', 'running');
+"""
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    username: str
+    params: Dict[str, Any]
+    endpoint_class: str
+
+
+class JobQueue:
+    """Synchronous queue operations; one connection per process, serialised by a lock"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def submit(self, key: str, kind: str, username: str, params: Dict[str, Any], endpoint_class: str) -> str:
+        """Returns the id of the queued or running job for key, enqueueing one if there is none.
+
+        Finished jobs for the same key are left alone: waiters in other
+        processes may not have polled their result yet, and purge() drops
+        them after JOB_RESULT_TTL.
+        """
+        priority = DEFAULT_CLASSES.get(endpoint_class, DEFAULT_CLASSES["stats"])[0]
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE key = ? AND status IN ('queued', 'running')", (key,)
+                ).fetchone()
+                if row is not None:
+                    # A more urgent caller joining a queued job moves it up the line
+                    conn.execute(
+                        "UPDATE jobs SET priority = MIN(priority, ?), endpoint_class = "
+                        "CASE WHEN priority > ? THEN ? ELSE endpoint_class END "
+                        "WHERE id = ? AND status = 'queued'",
+                        (priority, priority, endpoint_class, row[0]),
+                    )
+                    conn.execute("COMMIT")
+                    return row[0]
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO jobs (id, key, kind, username, params, endpoint_class, priority, status, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, 'queued', ?)",
+                    (job_id, key, kind, username, json.dumps(params), endpoint_class, priority, time.time()),
+                )
+                conn.execute("COMMIT")
+                return job_id
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def finished(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Results of the given jobs that are done"""
+        if not ids:
+            return {}
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT id, result FROM jobs WHERE status = 'done' AND id IN ({','.join('?' * len(ids))})",
+                ids,
+            ).fetchall()
+        return {job_id: json.loads(result) for job_id, result in rows}
+
+    def claim(self, worker: str, limit: int) -> List[Job]:
+        """Marks up to limit queued jobs as running by worker, most urgent first"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs left running by a worker that died go back in the queue
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND claimed_at < ?",
+                    (now - JOB_TIMEOUT,),
+                )
+                rows = conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, claimed_at = ? WHERE id IN ("
+                    "SELECT id FROM jobs WHERE status = 'queued' ORDER BY priority, created_at LIMIT ?"
+                    ") RETURNING id, kind, username, params, endpoint_class",
+                    (worker, now, limit),
+                ).fetchall()
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return [Job(r[0], r[1], r[2], json.loads(r[3]), r[4]) for r in rows]
+
+    def complete(self, job_id: str, result: Dict[str, Any]):
+        with self._lock:
+            self._connection().execute(
+                "UPDATE jobs SET status = 'done', result = ?, finished_at = ? WHERE id = ?",
+                (json.dumps(result), time.time(), job_id),
+            )
+
+    def purge(self, older_than: float = JOB_RESULT_TTL):
+        """Drops finished jobs whose results every waiter has had time to read"""
+        with self._lock:
+            self._connection().execute(
+                "DELETE FROM jobs WHERE status = 'done' AND finished_at < ?", (time.time() - older_than,)
+            )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+class JobClient:
+    """Submits jobs from an API process and awaits their results"""
+
+    def __init__(self, path: str = SCRAPE_QUEUE, timeout: float = JOB_TIMEOUT,
+                 poll_interval: float = JOB_POLL_INTERVAL):
+        self.queue = JobQueue(path)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self._refs: Dict[str, int] = {}
+        self._poller: Optional[asyncio.Task] = None
+        self.submitted = 0
+
+    async def run(self, kind: str, username: str, params: Dict[str, Any], endpoint_class: str) -> Dict[str, Any]:
+        """Result of the job for (kind, username, params); raises Overloaded if the worker shed it"""
+        key = ":".join([kind, username, *(f"{k}={v}" for k, v in sorted(params.items()))])
+        job_id = await asyncio.to_thread(self.queue.submit, key, kind, username, params, endpoint_class)
+        self.submitted += 1
+
+        future = self._waiters.get(job_id)
+        if future is None:
+            future = self._waiters[job_id] = asyncio.get_running_loop().create_future()
+        self._refs[job_id] = self._refs.get(job_id, 0) + 1
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+
+        try:
+            envelope = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            return {"error": f"Scrape job timed out after {self.timeout:.0f}s", "userName": username}
+        finally:
+            # The last waiter to leave stops polling for the job
+            self._refs[job_id] -= 1
+            if not self._refs[job_id]:
+                del self._refs[job_id]
+                self._waiters.pop(job_id, None)
+
+        if "overloaded" in envelope:
+            shed = envelope["overloaded"]
+            raise Overloaded(shed["endpointClass"], shed["retryAfter"])
+        return envelope["result"]
+
+    async def _poll(self):
+        """One query per interval finds every finished job this process is waiting on"""
+        while self._waiters:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                done = await asyncio.to_thread(self.queue.finished, list(self._waiters))
+            except sqlite3.Error as e:
+                print(f"⚠️ Job queue poll failed: {e}")
+                continue
+            for job_id, envelope in done.items():
+                future = self._waiters.pop(job_id, None)
+                if future is not None and not future.done():
+                    future.set_result(envelope)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.queue.path,
+            "submitted": self.submitted,
+            "waiting": len(self._waiters),
+            "queue": self.queue.stats(),
+        }
+
+
+class JobWorker:
+    """Claims jobs and runs them with bounded concurrency"""
+
+    def __init__(self, run_job: Callable[[Job], Awaitable[Dict[str, Any]]], path: str = SCRAPE_QUEUE,
+                 concurrency: int = WORKER_CONCURRENCY, poll_interval: float = JOB_POLL_INTERVAL):
+        self.queue = JobQueue(path)
+        self.run_job = run_job
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._running: Set[asyncio.Task] = set()
+        self.completed = 0
+
+    async def _execute(self, job: Job):
+        started = time.monotonic()
+        try:
+            envelope = {"result": await self.run_job(job)}
+        except Overloaded as e:
+            envelope = {"overloaded": {"endpointClass": e.endpoint_class, "retryAfter": e.retry_after}}
+        except Exception as e:
+            envelope = {"result": {"error": f"Scraping failed: {str(e)}", "userName": job.username}}
+        await asyncio.to_thread(self.queue.complete, job.id, envelope)
+        self.completed += 1
+        print(f"🧰 {job.kind} job for {job.username} done in {time.monotonic() - started:.2f}s")
+
+    async def serve(self):
+        print(f"🧰 Scrape worker {self.name} serving {self.queue.path}")
+        last_purge = 0.0
+        while True:
+            free = self.concurrency - len(self._running)
+            jobs = await asyncio.to_thread(self.queue.claim, self.name, free) if free > 0 else []
+            for job in jobs:
+                task = asyncio.create_task(self._execute(job))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+            if time.monotonic() - last_purge > JOB_RESULT_TTL / 2:
+                await asyncio.to_thread(self.queue.purge)
+                last_purge = time.monotonic()
+            if not jobs:
+                await asyncio.sleep(self.poll_interval)
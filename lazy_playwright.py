@@ -0,0 +1,30 @@
+"""
+Deferred Playwright imports.
+
+playwright.async_api is only imported when a browser is first started, so
+importing the app, and serving cached, fast-path or rejected requests, never
+loads it. Modules that only need Playwright types import them under
+TYPE_CHECKING. Errors are classified without importing Playwright: an
+exception can only be a Playwright error once Playwright has been loaded.
+"""
+
+import sys
+from typing import Any
+
+_MODULE = "playwright.async_api"
+
+
+def async_playwright() -> Any:
+    """playwright.async_api.async_playwright(), imported on first use"""
+    from playwright.async_api import async_playwright as start
+    return start()
+
+
+def is_playwright_error(error: BaseException) -> bool:
+    module = sys.modules.get(_MODULE)
+    return module is not None and isinstance(error, module.Error)
+
+
+def is_timeout_error(error: BaseException) -> bool:
+    module = sys.modules.get(_MODULE)
+    return module is not None and isinstance(error, module.TimeoutError)
@@ -0,0 +1,264 @@
+"""
+Leaderboards over named groups of users.
+
+Each group keeps one sorted index per ranked metric, updated whenever a
+scrape of a member finishes (and seeded from the history store when the
+group is created), so a page of the leaderboard, a user's rank or a
+comparison is an O(log n) lookup instead of one scrape per member.
+Ranks are competition ranks: users with equal values share a rank.
+
+Group membership is kept in the history database (GroupStore), so every
+API process sees the same groups and they survive restarts. Each process
+keeps its own indexes and refreshes them from the store: changed groups
+are reloaded by revision, and member values from recent snapshots.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sortedcontainers import SortedList
+
+
+# Configuration
+LEADERBOARD_MAX_MEMBERS = int(os.environ.get("LEADERBOARD_MAX_MEMBERS", "10000"))
+LEADERBOARD_SYNC_INTERVAL = float(os.environ.get("LEADERBOARD_SYNC_INTERVAL", "1"))
+LEADERBOARD_MAX_GROUPS = int(os.environ.get("LEADERBOARD_MAX_GROUPS", "100"))
+LEADERBOARD_ADMIN_TOKEN = os.environ.get("LEADERBOARD_ADMIN_TOKEN", "")
+
+# Ranked metric -> the result kind it is read from
+METRICS = {
+    "totalProblemsSolved": "stats",
+    "codingScore": "profile",
+    "potdStreak": "profile",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leaderboard_groups (
+    name TEXT PRIMARY KEY,
+    revision TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leaderboard_members (
+    name TEXT NOT NULL,
+    username TEXT NOT NULL,
+    PRIMARY KEY (name, username)
+) WITHOUT ROWID;
+"""
+
+
+class MetricIndex:
+    """Users ordered by one metric, highest first, ties by username"""
+
+    def __init__(self):
+        self._sorted = SortedList()  # (-value, username)
+        self._values: Dict[str, int] = {}
+
+    def update(self, username: str, value: int):
+        old = self._values.get(username)
+        if old == value:
+            return
+        if old is not None:
+            self._sorted.remove((-old, username))
+        self._sorted.add((-value, username))
+        self._values[username] = value
+
+    def discard(self, username: str):
+        old = self._values.pop(username, None)
+        if old is not None:
+            self._sorted.remove((-old, username))
+
+    def value(self, username: str) -> Optional[int]:
+        return self._values.get(username)
+
+    def rank(self, username: str) -> Optional[int]:
+        """1 + the number of users with a strictly higher value"""
+        value = self._values.get(username)
+        if value is None:
+            return None
+        return self._sorted.bisect_left((-value, "")) + 1
+
+    def page(self, offset: int, limit: int) -> List[Dict[str, Any]]:
+        entries = []
+        for neg_value, username in self._sorted.islice(offset, offset + limit):
+            entries.append({
+                "rank": self._sorted.bisect_left((neg_value, "")) + 1,
+                "userName": username,
+                "value": -neg_value,
+            })
+        return entries
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class Group:
+    def __init__(self, name: str, members: Iterable[str], revision: str = ""):
+        self.name = name
+        self.members: Set[str] = set(members)
+        self.revision = revision
+        self.indexes = {metric: MetricIndex() for metric in METRICS}
+
+
+class GroupStore:
+    """Group definitions shared by every process using the same database; one connection per process"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def save(self, name: str, members: List[str], max_groups: int = LEADERBOARD_MAX_GROUPS) -> Optional[str]:
+        """Replaces a group's members; returns its new revision, or None if a new group would exceed max_groups"""
+        revision = uuid.uuid4().hex
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                exists = conn.execute("SELECT 1 FROM leaderboard_groups WHERE name = ?", (name,)).fetchone()
+                if not exists and conn.execute("SELECT COUNT(*) FROM leaderboard_groups").fetchone()[0] >= max_groups:
+                    conn.execute("ROLLBACK")
+                    return None
+                conn.execute("DELETE FROM leaderboard_members WHERE name = ?", (name,))
+                conn.executemany(
+                    "INSERT INTO leaderboard_members (name, username) VALUES (?, ?)",
+                    [(name, username) for username in members],
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO leaderboard_groups (name, revision, updated_at) VALUES (?, ?, ?)",
+                    (name, revision, time.time()),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return revision
+
+    def delete(self, name: str) -> bool:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                deleted = conn.execute("DELETE FROM leaderboard_groups WHERE name = ?", (name,)).rowcount
+                conn.execute("DELETE FROM leaderboard_members WHERE name = ?", (name,))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return bool(deleted)
+
+    def revisions(self) -> Dict[str, str]:
+        """Current revision of every group"""
+        with self._lock:
+            return dict(self._connection().execute("SELECT name, revision FROM leaderboard_groups").fetchall())
+
+    def load(self, names: List[str]) -> Dict[str, Tuple[str, List[str]]]:
+        """(revision, members) of the given groups that still exist"""
+        groups = {}
+        with self._lock:
+            conn = self._connection()
+            for name in names:
+                row = conn.execute("SELECT revision FROM leaderboard_groups WHERE name = ?", (name,)).fetchone()
+                if row is None:
+                    continue
+                members = conn.execute(
+                    "SELECT username FROM leaderboard_members WHERE name = ?", (name,)
+                ).fetchall()
+                groups[name] = (row[0], [m for (m,) in members])
+        return groups
+
+
+class Leaderboards:
+    """Named groups and a reverse index from member to groups"""
+
+    def __init__(self):
+        self.groups: Dict[str, Group] = {}
+        self._member_of: Dict[str, Set[str]] = {}
+
+    def set_group(self, name: str, members: Iterable[str], revision: str = "") -> Group:
+        """Creates or replaces a group; values already known for kept members are retained"""
+        members = list(dict.fromkeys(members))[:LEADERBOARD_MAX_MEMBERS]
+        old = self.groups.get(name)
+        group = Group(name, members, revision)
+        if old is not None:
+            for username in old.members - group.members:
+                self._member_of.get(username, set()).discard(name)
+            for metric, index in old.indexes.items():
+                for username in group.members & old.members:
+                    value = index.value(username)
+                    if value is not None:
+                        group.indexes[metric].update(username, value)
+        for username in group.members:
+            self._member_of.setdefault(username, set()).add(name)
+        self.groups[name] = group
+        return group
+
+    def delete_group(self, name: str) -> bool:
+        group = self.groups.pop(name, None)
+        if group is None:
+            return False
+        for username in group.members:
+            self._member_of.get(username, set()).discard(name)
+        return True
+
+    def observe(self, kind: str, username: str, result: Dict[str, Any]):
+        """Feeds a finished scrape into every group the user belongs to"""
+        names = self._member_of.get(username)
+        if not names or "error" in result:
+            return
+        for metric, metric_kind in METRICS.items():
+            if metric_kind != kind or not isinstance(result.get(metric), int):
+                continue
+            for name in names:
+                self.groups[name].indexes[metric].update(username, result[metric])
+
+    def missing(self, name: str) -> List[str]:
+        """Members with no value yet for some metric"""
+        group = self.groups[name]
+        return [u for u in group.members if any(index.value(u) is None for index in group.indexes.values())]
+
+    def page(self, name: str, metric: str, offset: int, limit: int) -> Dict[str, Any]:
+        group = self.groups[name]
+        index = group.indexes[metric]
+        return {
+            "group": name,
+            "metric": metric,
+            "members": len(group.members),
+            "ranked": len(index),
+            "offset": offset,
+            "entries": index.page(offset, limit),
+        }
+
+    def compare(self, name: str, usernames: Iterable[str]) -> Dict[str, Any]:
+        group = self.groups[name]
+        users = []
+        for username in dict.fromkeys(usernames):
+            users.append({
+                "userName": username,
+                "member": username in group.members,
+                "metrics": {
+                    metric: {"value": index.value(username), "rank": index.rank(username)}
+                    for metric, index in group.indexes.items()
+                },
+            })
+        return {"group": name, "members": len(group.members), "users": users}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: {"members": len(g.members), "ranked": {m: len(i) for m, i in g.indexes.items()}}
+            for name, g in self.groups.items()
+        }
+
@@ -5,25 +5,46 @@ This FastAPI application exposes endpoints to retrieve user profile data,
 solved problems statistics, and detailed problem lists from GeeksforGeeks.
 """
 
+import hmac
+
 import uvicorn
-from fastapi import FastAPI, Query, Response, HTTPException
+from fastapi import Depends, FastAPI, Header, Query, Request, Response, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from typing import Dict, List, Literal
+from typing import Dict, List, Literal, Optional
 from contextlib import asynccontextmanager
 
 # Internal imports
-from scraper import get_gfg_data, fetch_user_profile, fetch_problem_list, close_browser
-from svg import generate_stats_svg
+import fastjson
+import metrics
+from admission import Overloaded, set_endpoint_class
+from scraper import (
+    get_gfg_data, fetch_user_profile, fetch_problem_list, fetch_user_bundle, fetch_history, close_browser,
+    encoded_result, scraper_status, stream_batch, stream_problem_list, start_refresher, stop_refresher, start_warmup, readiness,
+    set_leaderboard_group, delete_leaderboard_group, list_leaderboards, leaderboard_page, compare_users,
+    start_leaderboards
+)
+from history import HISTORY_MAX_POINTS
+from leaderboard import LEADERBOARD_ADMIN_TOKEN
+from negative import NEGATIVE_CACHE_TTL, is_confirmed_miss, valid_username
+from svg import RenderedCard, render_leaderboard_card, render_stats_card
 
 # ==================== Lifecycle Management ====================
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Handles startup and shutdown events."""
+    # Connects and warms the browser in the background; /ready reports when it is done
+    start_warmup()
+    # Keeps the most viewed users' stats and profiles scraped ahead of expiry
+    start_refresher()
+    # Rebuilds rankings for saved groups from the history store
+    await start_leaderboards()
     try:
         yield
     finally:
+        await stop_refresher()
         # Ensures the Playwright/Selenium browser instance closes on app exit
         await close_browser()
 
@@ -43,6 +64,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Reports the scrape phases behind each response in a Server-Timing header."""
+    if not metrics.SERVER_TIMING:
+        return await call_next(request)
+    timings = metrics.start_request_timing()
+    response = await call_next(request)
+    if timings:
+        response.headers["Server-Timing"] = metrics.server_timing_header(timings)
+    return response
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request, exc: Overloaded):
+    """Sheds load with a fast 503 instead of letting requests queue until Playwright times out."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 # ==================== Pydantic Models ====================
 
 class UserProfile(BaseModel):
@@ -75,12 +116,79 @@ class SolvedProblems(BaseModel):
     problemsByDifficulty: Dict[str, int]
     Problems: Dict[str, List[Problem]]
 
+class BatchRequest(BaseModel):
+    usernames: List[str] = Field(..., min_length=1, max_length=5000, description="GeeksforGeeks usernames")
+
+class UserBundle(BaseModel):
+    userName: str
+    profile: UserProfile
+    stats: UserStats
+    problems: Optional[SolvedProblems] = None
+
+# ==================== SVG Responses ====================
+
+SVG_CACHE_CONTROL = "public, max-age=14400"
+LEADERBOARD_CACHE_CONTROL = "public, max-age=300"
+
+def _accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """Picks br or gzip from an Accept-Encoding header, ignoring codings with q=0"""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip().lower())
+    if "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+def _svg_response(request: Request, card: RenderedCard, cache_control: str = SVG_CACHE_CONTROL) -> Response:
+    """Serves a cached, precompressed card, answering matching If-None-Match with 304"""
+    encoding = _accepted_encoding(request.headers.get("accept-encoding", ""))
+    body, etag = card.variant(encoding)
+    headers = {"Cache-Control": cache_control, "ETag": etag, "Vary": "Accept-Encoding"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and card.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    if body is not card.body:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="image/svg+xml", headers=headers)
+
+# ==================== Not Found Responses ====================
+
+NOT_FOUND_CACHE_CONTROL = f"public, max-age={NEGATIVE_CACHE_TTL}"
+
+def _not_found(data: Dict) -> HTTPException:
+    """404 for an error result; cacheable when the user is malformed or confirmed missing"""
+    headers = {"Cache-Control": NOT_FOUND_CACHE_CONTROL} if is_confirmed_miss(data) else None
+    return HTTPException(status_code=404, detail=data["error"], headers=headers)
+
 # ==================== API Endpoints ====================
 
 @app.get("/", tags=["System"])
 def health_check():
     return {"status": "ok", "service": "GFG Scraper"}
 
+@app.get("/ready", tags=["System"])
+def readiness_check():
+    """Readiness probe: 503 until the browser fleet is connected and its pages are warm."""
+    state = readiness()
+    return state if state["ready"] else JSONResponse(status_code=503, content=state)
+
+@app.get("/system/status", tags=["System"])
+def status():
+    """Cache, request coalescing and blocked/allowed browser traffic counters."""
+    return scraper_status()
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    """Prometheus metrics: per-phase scrape latency, retries, cache, pool and admission counters."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/docs", include_in_schema=False)
 def custom_docs():
     from docs import get_custom_docs_html
@@ -91,51 +199,204 @@ async def get_user_profile_endpoint(userName: str):
     """Get comprehensive profile info: Score, Rank, and Streaks."""
     data = await fetch_user_profile(userName)
     if "error" in data:
-        raise HTTPException(status_code=404, detail=data["error"])
+        raise _not_found(data)
     return data
 
 @app.get("/stats/{userName}", tags=["User Data"])
 async def get_user_stats_endpoint(
+    request: Request,
     userName: str,
     format: Literal["json", "svg"] = Query("json", description="Output format")
 ):
     """Get problem solving stats broken down by difficulty. Supports JSON or SVG."""
+    if format == "svg":
+        set_endpoint_class("badge")
     data = await get_gfg_data(userName)
     
     if "error" in data:
-        raise HTTPException(status_code=404, detail=data["error"])
+        raise _not_found(data)
 
     if format == "svg":
-        svg_content = generate_stats_svg(data)
-        return Response(
-            content=svg_content, 
-            media_type="image/svg+xml", 
-            headers={"Cache-Control": "public, max-age=14400"}
-        )
+        return _svg_response(request, render_stats_card(data))
         
     return data
 
+@app.get("/history/{userName}", tags=["User Data"])
+async def get_user_history_endpoint(
+    userName: str,
+    kind: Literal["stats", "profile"] = Query("stats", description="Which recorded values to return"),
+    since: Optional[float] = Query(None, description="Start of the range, Unix seconds"),
+    until: Optional[float] = Query(None, description="End of the range, Unix seconds (default now)"),
+    points: int = Query(HISTORY_MAX_POINTS, ge=1, le=HISTORY_MAX_POINTS, description="Maximum points; longer ranges are downsampled"),
+):
+    """Stats or profile values over time, recorded whenever they changed. Never scrapes."""
+    history = await fetch_history(userName, kind, since, until, points)
+    if history is None:
+        raise HTTPException(status_code=503, detail="History store is disabled")
+    if not history and since is None and until is None:
+        raise HTTPException(status_code=404, detail="No history recorded for user")
+    return {"userName": userName, "kind": kind, "count": len(history), "points": history}
+
+def _ndjson_batch(fetch, kind: str, usernames: List[str]) -> StreamingResponse:
+    async def lines():
+        async for result in stream_batch(fetch, usernames):
+            if "error" in result:
+                yield fastjson.dumps(result) + b"\n"
+            else:
+                yield await encoded_result(kind, result["userName"], result) + b"\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/stats/batch", tags=["Batch"])
+async def batch_stats_endpoint(body: BatchRequest):
+    """Stream difficulty stats for many users as NDJSON, one line per user as each completes."""
+    return _ndjson_batch(get_gfg_data, "stats", body.usernames)
+
+@app.post("/profile/batch", tags=["Batch"])
+async def batch_profile_endpoint(body: BatchRequest):
+    """Stream profiles for many users as NDJSON, one line per user as each completes."""
+    return _ndjson_batch(fetch_user_profile, "profile", body.usernames)
+
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+def _stream_format(request: Request, stream: Optional[str]) -> Optional[str]:
+    if stream:
+        return stream
+    accept = request.headers.get("accept", "")
+    for fmt, media_type in STREAM_MEDIA_TYPES.items():
+        if media_type in accept:
+            return fmt
+    return None
+
+async def _stream_problems(userName: str, fmt: str) -> StreamingResponse:
+    chunks = stream_problem_list(userName)
+    # Wait for the counts so a missing user or a shed request still gets a proper status code
+    first = await chunks.__anext__()
+    if "error" in first:
+        await chunks.aclose()
+        raise _not_found(first)
+
+    async def body():
+        async for chunk in _prepend(first, chunks):
+            if fmt == "sse":
+                event = "difficulty" if "difficulty" in chunk else "error" if "error" in chunk else "counts"
+                yield f"event: {event}\ndata: {fastjson.dumps(chunk).decode()}\n\n"
+            else:
+                yield fastjson.dumps(chunk) + b"\n"
+        if fmt == "sse":
+            yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(body(), media_type=STREAM_MEDIA_TYPES[fmt])
+
+async def _prepend(first, rest):
+    yield first
+    async for item in rest:
+        yield item
+
 @app.get("/problems/{userName}", tags=["Problem Lists"], response_model=SolvedProblems)
-async def get_solved_problems_endpoint(userName: str):
+async def get_solved_problems_endpoint(
+    request: Request,
+    userName: str,
+    stream: Optional[Literal["ndjson", "sse"]] = Query(
+        None, description="Stream the counts, then one chunk per difficulty, as NDJSON or Server-Sent Events"
+    )
+):
     """Get a detailed list of ALL solved problems with URLs."""
+    fmt = _stream_format(request, stream)
+    if fmt:
+        return await _stream_problems(userName, fmt)
+
     data = await fetch_problem_list(userName)
     if "error" in data:
-        raise HTTPException(status_code=404, detail=data["error"])
+        raise _not_found(data)
+    # Scraper output already has the SolvedProblems shape; response_model still documents it
+    return Response(await encoded_result("problems", userName, data), media_type="application/json")
+
+@app.get("/user/{userName}", tags=["User Data"], response_model=UserBundle, response_model_exclude_none=True)
+async def get_user_bundle_endpoint(
+    userName: str,
+    problems: bool = Query(False, description="Also include the per-difficulty problem lists")
+):
+    """Get profile, stats and optionally problem lists from a single page load."""
+    data = await fetch_user_bundle(userName, include_problems=problems)
+    if "error" in data:
+        raise _not_found(data)
+    for part in ("profile", "stats", "problems"):
+        if "error" in data.get(part, {}):
+            raise _not_found(data[part])
     return data
 
+LeaderboardMetric = Literal["totalProblemsSolved", "codingScore", "potdStreak"]
+
+def _unknown_group(group: str) -> HTTPException:
+    return HTTPException(status_code=404, detail=f"Unknown leaderboard group: {group}")
+
+def _require_leaderboard_admin(x_admin_token: Optional[str] = Header(None)):
+    """Group writes need the X-Admin-Token header to match LEADERBOARD_ADMIN_TOKEN; unset, they are disabled."""
+    if not LEADERBOARD_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Leaderboard writes are disabled (LEADERBOARD_ADMIN_TOKEN is not set)")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), LEADERBOARD_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Missing or invalid X-Admin-Token header")
+
+@app.get("/leaderboard", tags=["Leaderboards"])
+async def list_leaderboards_endpoint():
+    """Named groups with their member and ranked-member counts."""
+    return await list_leaderboards()
+
+@app.put("/leaderboard/{group}", tags=["Leaderboards"], dependencies=[Depends(_require_leaderboard_admin)])
+async def set_leaderboard_endpoint(group: str, body: BatchRequest):
+    """Create or replace a group. Members with no recorded data are scraped once in the background."""
+    invalid = [username for username in body.usernames if not valid_username(username)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid usernames: {', '.join(invalid[:10])}")
+    result = await set_leaderboard_group(group, body.usernames)
+    if "error" in result:
+        raise HTTPException(status_code=409, detail=result["error"])
+    return result
+
+@app.delete("/leaderboard/{group}", tags=["Leaderboards"], dependencies=[Depends(_require_leaderboard_admin)])
+async def delete_leaderboard_endpoint(group: str):
+    """Delete a group."""
+    if not await delete_leaderboard_group(group):
+        raise _unknown_group(group)
+    return {"group": group, "deleted": True}
+
+@app.get("/leaderboard/{group}", tags=["Leaderboards"])
+async def get_leaderboard_endpoint(
+    request: Request,
+    group: str,
+    metric: LeaderboardMetric = Query("totalProblemsSolved", description="Metric to rank by"),
+    offset: int = Query(0, ge=0, description="Rank offset of the first entry"),
+    limit: int = Query(10, ge=1, le=100, description="Entries per page"),
+    format: Literal["json", "svg"] = Query("json", description="Output format"),
+):
+    """A page of a group's ranking, read from precomputed indexes. Never scrapes."""
+    page = await leaderboard_page(group, metric, offset, limit)
+    if page is None:
+        raise _unknown_group(group)
+    if format == "svg":
+        return _svg_response(request, render_leaderboard_card(page), LEADERBOARD_CACHE_CONTROL)
+    return page
+
+@app.get("/compare/{group}", tags=["Leaderboards"])
+async def compare_endpoint(
+    group: str,
+    users: List[str] = Query(..., min_length=1, max_length=50, description="Usernames to compare"),
+):
+    """Values and ranks of several users within a group for every ranked metric."""
+    result = await compare_users(group, users)
+    if result is None:
+        raise _unknown_group(group)
+    return result
+
 @app.get("/{userName}", tags=["Widgets"])
-async def get_stats_card(userName: str):
+async def get_stats_card(request: Request, userName: str):
     """Direct SVG Stats Card endpoint for GitHub READMEs."""
+    set_endpoint_class("badge")
     data = await get_gfg_data(userName)
     if "error" in data:
-         raise HTTPException(status_code=404, detail=data["error"])
+         raise _not_found(data)
          
-    svg_content = generate_stats_svg(data)
-    return Response(
-        content=svg_content, 
-        media_type="image/svg+xml", 
-        headers={"Cache-Control": "public, max-age=14400"}
-    )
+    return _svg_response(request, render_stats_card(data))
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=5000)
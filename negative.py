@@ -0,0 +1,164 @@
+"""
+Negative-result cache for usernames that do not resolve to a public profile.
+
+Typos and deleted accounts in README badges are requested forever, and each
+request used to cost a browser session before GFG's login redirect showed
+the user does not exist. Usernames that cannot be valid are now rejected by
+syntax before any scraping, and confirmed misses (login redirect, i.e. not
+found or private) are remembered for NEGATIVE_CACHE_TTL.
+
+Recent misses sit in an exact LRU with their error message. Every miss also
+goes into a time-bucketed Bloom filter: NEGATIVE_BLOOM_BUCKETS filters, each
+covering an equal slice of the TTL, with the oldest dropped as time moves on.
+The Bloom filter keeps misses that fell out of the LRU in fixed memory, at
+the cost of a small false-positive rate (NEGATIVE_BLOOM_ERROR per bucket).
+A user who is later scraped successfully gets an LRU tombstone that
+overrides the filter.
+"""
+
+import hashlib
+import math
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from cache import LRUCache
+
+
+# Configuration
+NEGATIVE_CACHE_TTL = int(os.environ.get("NEGATIVE_CACHE_TTL", "3600"))
+NEGATIVE_CACHE_MAX_ENTRIES = int(os.environ.get("NEGATIVE_CACHE_MAX_ENTRIES", "10000"))
+NEGATIVE_BLOOM_CAPACITY = int(os.environ.get("NEGATIVE_BLOOM_CAPACITY", "100000"))
+NEGATIVE_BLOOM_ERROR = float(os.environ.get("NEGATIVE_BLOOM_ERROR", "0.00001"))
+NEGATIVE_BLOOM_BUCKETS = int(os.environ.get("NEGATIVE_BLOOM_BUCKETS", "4"))
+USERNAME_PATTERN = re.compile(os.environ.get("USERNAME_PATTERN", r"^[A-Za-z0-9_.\-]{1,64}$"))
+
+# Static files and probes that browsers and bots request on /{userName}
+_FILE_SUFFIX = re.compile(r"\.(ico|png|jpe?g|gif|svg|webp|txt|xml|json|js|css|map|php|aspx?|html?|env)$", re.I)
+
+INVALID_USERNAME_ERROR = "Invalid username"
+NOT_FOUND_ERROR = "User not found or private profile"
+
+
+def valid_username(username: str) -> bool:
+    """Syntax check only; a valid username may still not exist"""
+    return bool(USERNAME_PATTERN.match(username)) and not _FILE_SUFFIX.search(username)
+
+
+def is_login_redirect(url: str) -> bool:
+    """True when GFG sent a profile request to its login page (user not found or private).
+
+    Only the host and path are checked, so usernames that merely contain
+    "auth" are not mistaken for misses.
+    """
+    parts = urlsplit(url)
+    return (parts.hostname or "").startswith("auth.") or parts.path == "/auth" or parts.path.startswith("/auth/")
+
+
+def is_confirmed_miss(result: Dict[str, Any]) -> bool:
+    """True for results that will not change on retry, so a 404 for them may be cached"""
+    return result.get("error") in (INVALID_USERNAME_ERROR, NOT_FOUND_ERROR)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over one blake2b digest"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class NegativeCache:
+    """Confirmed misses: an exact LRU in front of time-bucketed Bloom filters"""
+
+    def __init__(self, ttl: int = NEGATIVE_CACHE_TTL, max_entries: int = NEGATIVE_CACHE_MAX_ENTRIES,
+                 buckets: int = NEGATIVE_BLOOM_BUCKETS, capacity: int = NEGATIVE_BLOOM_CAPACITY,
+                 error_rate: float = NEGATIVE_BLOOM_ERROR):
+        self.ttl = ttl
+        self.bucket_width = ttl / max(1, buckets)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # username -> (error message, or None for a user known to exist; expires at)
+        self._exact = LRUCache(max_entries)
+        self._buckets: List[Tuple[int, BloomFilter]] = []  # (bucket number, filter), oldest first
+        self.exact_hits = 0
+        self.bloom_hits = 0
+        self.rejected = 0
+
+    def _bucket(self, now: float) -> int:
+        return int(now // self.bucket_width)
+
+    def _live_buckets(self, now: float) -> List[BloomFilter]:
+        # A bucket is dropped when its first entry reaches the TTL
+        current = self._bucket(now)
+        oldest = current - math.ceil(self.ttl / self.bucket_width)
+        self._buckets = [(n, f) for n, f in self._buckets if n > oldest]
+        return [f for _, f in self._buckets]
+
+    def add(self, username: str, error: str, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        self._exact.set(username, (error, now + self.ttl))
+        self._live_buckets(now)
+        current = self._bucket(now)
+        if not self._buckets or self._buckets[-1][0] != current:
+            self._buckets.append((current, BloomFilter(self.capacity, self.error_rate)))
+        self._buckets[-1][1].add(username)
+
+    def clear(self, username: str, now: Optional[float] = None):
+        """Marks a user as existing, overriding the Bloom filters until the TTL passes"""
+        now = time.time() if now is None else now
+        entry = self._exact.get(username)
+        if (entry is not None and entry[0] is not None) or any(username in f for f in self._live_buckets(now)):
+            self._exact.set(username, (None, now + self.ttl))
+
+    def get(self, username: str, now: Optional[float] = None) -> Optional[str]:
+        """Error message of a remembered miss, or None if the user should be scraped"""
+        now = time.time() if now is None else now
+        entry = self._exact.get(username)
+        if entry is not None:
+            error, expires_at = entry
+            if now >= expires_at:
+                self._exact.pop(username)
+                return None
+            if error is not None:
+                self.exact_hits += 1
+            return error
+        if any(username in f for f in self._live_buckets(now)):
+            self.bloom_hits += 1
+            return NOT_FOUND_ERROR
+        return None
+
+    def check(self, username: str) -> Optional[str]:
+        """Error message if username is malformed or a remembered miss; None if it should be scraped"""
+        if not valid_username(username):
+            self.rejected += 1
+            return INVALID_USERNAME_ERROR
+        return self.get(username)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._exact),
+            "bloomBuckets": len(self._buckets),
+            "bloomEntries": sum(f.count for _, f in self._buckets),
+            "exactHits": self.exact_hits,
+            "bloomHits": self.bloom_hits,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,269 @@
+"""
+Warm pool of browser contexts/pages on one browser endpoint.
+
+Pages are created ahead of time, reset between uses (cookies cleared,
+about:blank) and health-checked on checkout. A page that has served
+BROWSER_POOL_MAX_USES scrapes is retired and replaced in the background,
+one member at a time, so no request ever waits on a full reconnect.
+
+The endpoint is a CDP URL (remote Browserless, or any Chromium started with
+--remote-debugging-port), or "local" to launch a headless Chromium in-process.
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, AsyncIterator, Deque, Dict, Optional, Set
+
+import interception
+from lazy_playwright import async_playwright
+from metrics import phase
+from interception import TrafficStats
+
+if TYPE_CHECKING:
+    from playwright.async_api import Browser, BrowserContext, Page, Playwright
+
+
+# Configuration
+BROWSERLESS_TOKEN = os.environ.get("BROWSERLESS_TOKEN", "")
+BROWSER_URL = os.environ.get("BROWSER_URL", f"wss://chrome.browserless.io?token={BROWSERLESS_TOKEN}")
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "4"))
+BROWSER_POOL_MAX_USES = int(os.environ.get("BROWSER_POOL_MAX_USES", "50"))
+CONNECT_TIMEOUT = 30000
+LOCAL_BROWSER_ARGS = ["--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu"]
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+
+@dataclass
+class PooledPage:
+    browser: "Browser"
+    context: "BrowserContext"
+    page: "Page"
+    uses: int = 0
+    traffic: TrafficStats = field(default_factory=TrafficStats)
+
+
+class BrowserPool:
+    """Fixed-size pool of warm pages sharing one CDP connection"""
+
+    def __init__(self, browser_url: str = BROWSER_URL, size: int = BROWSER_POOL_SIZE,
+                 max_uses: int = BROWSER_POOL_MAX_USES):
+        self.browser_url = browser_url
+        self.size = size
+        self.max_uses = max_uses
+        self._playwright: Optional["Playwright"] = None
+        self._browser: Optional["Browser"] = None
+        self._connecting: Optional[asyncio.Task] = None
+        self._idle: "asyncio.Queue[PooledPage]" = asyncio.Queue()
+        self._slots = asyncio.Semaphore(size)  # bounds pages checked out at once
+        self._members = 0  # live members plus members being created
+        self._recycle_lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+        self.recycled = 0
+        self.connects = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.traffic = TrafficStats()
+        self.recent_traffic: Deque[Dict[str, Any]] = deque(maxlen=100)
+
+    # --- Connection ---
+
+    async def get_browser(self) -> "Browser":
+        """Returns the shared browser, starting at most one connect at a time"""
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+        if self._connecting is None or self._connecting.done():
+            self._connecting = asyncio.create_task(self._connect())
+        return await asyncio.shield(self._connecting)
+
+    async def _connect(self) -> "Browser":
+        local = self.browser_url == "local"
+        print("🚀 Launching local Chromium..." if local else "🚀 Connecting to Remote Browserless...")
+        try:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            with phase("connect"):
+                if local:
+                    browser = await self._playwright.chromium.launch(
+                        headless=True, args=LOCAL_BROWSER_ARGS, timeout=CONNECT_TIMEOUT
+                    )
+                else:
+                    browser = await self._playwright.chromium.connect_over_cdp(
+                        self.browser_url, timeout=CONNECT_TIMEOUT
+                    )
+        except Exception as e:
+            print(f"❌ Failed to connect to browser: {e}")
+            raise
+        browser.on("disconnected", lambda _: self._on_disconnected(browser))
+        self._browser = browser
+        self.connects += 1
+        print("✅ Browser connected successfully")
+        self._spawn(self._fill())
+        return browser
+
+    def _on_disconnected(self, browser: "Browser"):
+        if self._browser is browser:
+            print("⚠️ Browser disconnected; pages will be rebuilt on next checkout")
+            self._browser = None
+
+    # --- Members ---
+
+    async def _create(self) -> PooledPage:
+        browser = await self.get_browser()
+        with phase("new_context"):
+            context = await browser.new_context(user_agent=USER_AGENT)
+        traffic = TrafficStats()
+        try:
+            await interception.install(context, traffic)
+            with phase("new_page"):
+                page = await context.new_page()
+        except Exception:
+            await context.close()
+            raise
+        return PooledPage(browser=browser, context=context, page=page, traffic=traffic)
+
+    async def _grow(self) -> PooledPage:
+        self._members += 1
+        try:
+            return await self._create()
+        except Exception:
+            self._members -= 1
+            raise
+
+    def _is_healthy(self, member: PooledPage) -> bool:
+        return (
+            member.browser is self._browser
+            and member.browser.is_connected()
+            and not member.page.is_closed()
+        )
+
+    async def _discard(self, member: PooledPage):
+        self._members -= 1
+        try:
+            await member.context.close()
+        except Exception:
+            pass
+
+    async def _reset(self, member: PooledPage) -> bool:
+        try:
+            await member.context.clear_cookies()
+            await member.page.goto("about:blank")
+            return True
+        except Exception as e:
+            print(f"⚠️ Could not reset pooled page: {e}")
+            return False
+
+    async def _fill(self):
+        """Pre-creates members up to the pool size, one at a time"""
+        async with self._recycle_lock:
+            while self._members < self.size and self._browser is not None:
+                try:
+                    self._idle.put_nowait(await self._grow())
+                except Exception as e:
+                    print(f"⚠️ Could not warm pooled page: {e}")
+                    return
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def warm(self):
+        """Connects and fills the pool, so the first checkout finds a warm page"""
+        await self.get_browser()
+        await self._fill()
+        if self._idle.empty():
+            raise RuntimeError("No pooled page could be created")
+
+    async def probe(self):
+        """Health check: the browser is reachable and can open a context"""
+        browser = await self.get_browser()
+        context = await browser.new_context()
+        await context.close()
+
+    # --- Checkout ---
+
+    async def acquire(self) -> PooledPage:
+        await self._slots.acquire()
+        try:
+            while True:
+                try:
+                    member = self._idle.get_nowait()
+                except asyncio.QueueEmpty:
+                    member = await self._grow()
+
+                if self._is_healthy(member):
+                    member.uses += 1
+                    return member
+                await self._discard(member)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def release(self, member: PooledPage):
+        try:
+            if member.uses >= self.max_uses:
+                self.recycled += 1
+                await self._discard(member)
+                self._spawn(self._fill())
+            elif self._members > self.size:
+                await self._discard(member)
+            elif self._is_healthy(member) and await self._reset(member):
+                self._idle.put_nowait(member)
+            else:
+                await self._discard(member)
+                self._spawn(self._fill())
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator["Page"]:
+        """Checks out a warm page for the duration of one scrape"""
+        self.waiting += 1
+        try:
+            with phase("pool_checkout"):
+                member = await self.acquire()
+        finally:
+            self.waiting -= 1
+        member.traffic.reset()
+        self.in_use += 1
+        try:
+            yield member.page
+        finally:
+            self.in_use -= 1
+            self.traffic.add(member.traffic)
+            self.recent_traffic.append({"url": member.page.url, **member.traffic.as_dict()})
+            with phase("cleanup"):
+                await self.release(member)
+
+    def load(self) -> float:
+        """Pages checked out or waited for, as a share of the pool size"""
+        return (self.in_use + self.waiting) / max(self.size, 1)
+
+    def traffic_stats(self) -> Dict[str, Any]:
+        """Blocked vs. allowed traffic, in total and for the most recent scrapes"""
+        return {"total": self.traffic.as_dict(), "recent": list(self.recent_traffic)}
+
+    async def close(self):
+        """Closes every member, the browser connection and Playwright"""
+        for task in list(self._tasks):
+            task.cancel()
+        while not self._idle.empty():
+            await self._discard(self._idle.get_nowait())
+
+        if self._browser:
+            try:
+                await self._browser.close()
+            except Exception as e:
+                print(f"⚠️ Error during browser cleanup: {e}")
+            self._browser = None
+
+        if self._playwright:
+            try:
+                await self._playwright.stop()
+            except Exception as e:
+                print(f"⚠️ Error during playwright cleanup: {e}")
+            self._playwright = None
+        self._members = 0
@@ -0,0 +1,184 @@
+"""
+Popularity-aware background refresh.
+
+A handful of usernames produce most badge views. Every cached read is
+recorded in a bounded tracker of exponentially decayed access counts, and a
+background loop re-scrapes the hottest (kind, username) keys shortly before
+their cache entries expire. Refreshes are limited to a browser-session
+budget per minute, and the loop pauses while foreground demand is high.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+
+# Configuration
+REFRESH_ENABLED = os.environ.get("REFRESH_ENABLED", "1") == "1"
+REFRESH_SESSIONS_PER_MINUTE = float(os.environ.get("REFRESH_SESSIONS_PER_MINUTE", "10"))
+REFRESH_HOT_KEYS = int(os.environ.get("REFRESH_HOT_KEYS", "300"))
+REFRESH_HORIZON = float(os.environ.get("REFRESH_HORIZON", "600"))
+REFRESH_HALF_LIFE = float(os.environ.get("REFRESH_HALF_LIFE", "3600"))
+REFRESH_INTERVAL = float(os.environ.get("REFRESH_INTERVAL", "5"))
+REFRESH_PAUSE_LOAD = float(os.environ.get("REFRESH_PAUSE_LOAD", "0.75"))
+
+Key = Tuple[str, str]  # (kind, username)
+
+
+class PopularityTracker:
+    """Exponentially decayed access counts for at most max_keys keys"""
+
+    def __init__(self, max_keys: int = REFRESH_HOT_KEYS, half_life: float = REFRESH_HALF_LIFE):
+        self.max_keys = max_keys
+        self.decay = math.log(2) / half_life
+        self._scores: Dict[Key, Tuple[float, float]] = {}  # key -> (score, as of)
+
+    def _score(self, key: Key, now: float) -> float:
+        score, as_of = self._scores.get(key, (0.0, now))
+        return score * math.exp(-self.decay * (now - as_of))
+
+    def record(self, kind: str, username: str):
+        now = time.monotonic()
+        key = (kind, username)
+        self._scores[key] = (self._score(key, now) + 1.0, now)
+        # Prune in batches so recording stays O(1) amortised
+        if len(self._scores) > 2 * self.max_keys:
+            for cold in self.hottest(len(self._scores))[self.max_keys:]:
+                del self._scores[cold[0]]
+
+    def hottest(self, n: int) -> List[Tuple[Key, float]]:
+        now = time.monotonic()
+        ranked = sorted(((key, self._score(key, now)) for key in self._scores), key=lambda kv: kv[1], reverse=True)
+        return ranked[:n]
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+
+class RefreshScheduler:
+    """Re-scrapes hot keys ahead of cache expiry within a per-minute session budget"""
+
+    def __init__(
+        self,
+        tracker: PopularityTracker,
+        refresh: Callable[[str, str], Awaitable[Any]],
+        expires_at: Callable[[str, str], Awaitable[Optional[float]]],
+        foreground_load: Callable[[], float],
+        sessions_per_minute: float = REFRESH_SESSIONS_PER_MINUTE,
+        horizon: float = REFRESH_HORIZON,
+        interval: float = REFRESH_INTERVAL,
+        pause_load: float = REFRESH_PAUSE_LOAD,
+    ):
+        self.tracker = tracker
+        self.refresh = refresh
+        self.expires_at = expires_at
+        self.foreground_load = foreground_load
+        self.sessions_per_minute = sessions_per_minute
+        self.horizon = horizon
+        self.interval = interval
+        self.pause_load = pause_load
+        self._task: Optional[asyncio.Task] = None
+        self._tokens = sessions_per_minute
+        self._refilled_at = time.monotonic()
+        self.paused = False
+        self.queue: List[Dict[str, Any]] = []
+        self.refreshed = 0
+        self.failures = 0
+        self.last_tick: Optional[float] = None
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=50)
+        self._attempted: Dict[Key, float] = {}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.sessions_per_minute,
+            self._tokens + self.sessions_per_minute * (now - self._refilled_at) / 60,
+        )
+        self._refilled_at = now
+
+    async def _due(self) -> List[Dict[str, Any]]:
+        """Hot keys whose cache entry is missing or expires within the horizon, soonest first"""
+        now = time.time()
+        due = []
+        for (kind, username), score in self.tracker.hottest(self.tracker.max_keys):
+            # A key that keeps failing (e.g. a deleted user) is retried at most once per horizon
+            if now - self._attempted.get((kind, username), 0.0) < self.horizon:
+                continue
+            expires_at = await self.expires_at(kind, username)
+            if expires_at is None or expires_at - now < self.horizon:
+                due.append({
+                    "kind": kind,
+                    "userName": username,
+                    "score": round(score, 2),
+                    "expiresIn": None if expires_at is None else round(expires_at - now, 1),
+                })
+        due.sort(key=lambda d: float("-inf") if d["expiresIn"] is None else d["expiresIn"])
+        return due
+
+    async def _run(self):
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                print(f"⚠️ Refresh scheduler tick failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def tick(self):
+        self.last_tick = time.time()
+        self._refill()
+        self._attempted = {k: t for k, t in self._attempted.items() if self.last_tick - t < self.horizon}
+        self.queue = await self._due()
+
+        while self.queue and self._tokens >= 1:
+            self.paused = self.foreground_load() >= self.pause_load
+            if self.paused:
+                return
+            item = self.queue.pop(0)
+            self._tokens -= 1
+            self._attempted[(item["kind"], item["userName"])] = time.time()
+            started = time.monotonic()
+            try:
+                await self.refresh(item["kind"], item["userName"])
+                self.refreshed += 1
+                outcome = "ok"
+            except Exception as e:
+                self.failures += 1
+                outcome = f"failed: {e}"
+            self.recent.append({
+                "kind": item["kind"],
+                "userName": item["userName"],
+                "durationMs": round((time.monotonic() - started) * 1000, 1),
+                "outcome": outcome,
+            })
+        self.paused = self.foreground_load() >= self.pause_load
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "paused": self.paused,
+            "trackedKeys": len(self.tracker),
+            "tokens": round(self._tokens, 2),
+            "sessionsPerMinute": self.sessions_per_minute,
+            "lastTick": self.last_tick,
+            "queue": self.queue[:20],
+            "queueLength": len(self.queue),
+            "refreshed": self.refreshed,
+            "failures": self.failures,
+            "recent": list(self.recent),
+        }
@@ -0,0 +1,233 @@
+"""
+Retry policy for browser scrapes: adaptive timeouts, jittered retries and hedging.
+
+Every attempt's duration is kept per scrape kind in a rolling window, and
+each attempt's timeout is TIMEOUT_MULTIPLIER x the window's p99, clamped to
+[TIMEOUT_MIN, TIMEOUT_MAX]. Until LATENCY_MIN_SAMPLES attempts have been
+seen the old fixed timeouts apply. An attempt that times out is recorded at
+its timeout, so a target that genuinely slows down raises its own timeouts.
+
+Errors are classified as retryable (navigation timeouts, a closed target or
+a dropped connection, which a fresh page may not hit) or terminal (anything
+else, which another attempt would only repeat). Retries back off
+exponentially with full jitter, and the whole scrape stays within
+SCRAPE_DEADLINE, the old worst case.
+
+With HEDGE_SCRAPES on, an attempt still running at the p95 gets a second
+attempt on a fresh page and whichever finishes first wins; the other is
+cancelled. Hedges are only sent while the fleet has an idle page and stay
+under HEDGE_BUDGET of all attempts, so the few stuck navigations stop
+setting the tail latency without doubling browser load.
+"""
+
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+import metrics
+from lazy_playwright import is_playwright_error, is_timeout_error
+
+
+# Configuration
+RETRY_ATTEMPTS = int(os.environ.get("RETRY_ATTEMPTS", "2"))
+RETRY_BACKOFF = float(os.environ.get("RETRY_BACKOFF", "0.25"))
+RETRY_BACKOFF_MAX = float(os.environ.get("RETRY_BACKOFF_MAX", "4"))
+SCRAPE_DEADLINE = int(os.environ.get("SCRAPE_DEADLINE", "45000"))
+TIMEOUT_MULTIPLIER = float(os.environ.get("TIMEOUT_MULTIPLIER", "3"))
+TIMEOUT_MIN = int(os.environ.get("TIMEOUT_MIN", "5000"))
+TIMEOUT_MAX = int(os.environ.get("TIMEOUT_MAX", "45000"))
+LATENCY_WINDOW = int(os.environ.get("LATENCY_WINDOW", "200"))
+LATENCY_MIN_SAMPLES = int(os.environ.get("LATENCY_MIN_SAMPLES", "20"))
+HEDGE_SCRAPES = os.environ.get("HEDGE_SCRAPES", "1") == "1"
+HEDGE_BUDGET = float(os.environ.get("HEDGE_BUDGET", "0.1"))
+
+# Timeouts (ms) used until a kind has enough samples
+COLD_TIMEOUTS = {"profile": 30000, "stats": 30000, "problems": 45000}
+
+# Playwright error messages that mean the page or connection broke, not the target site
+RETRYABLE_MESSAGES = (
+    "Target closed",
+    "Target page, context or browser has been closed",
+    "Browser has been closed",
+    "Connection closed",
+    "ECONNREFUSED",
+    "ECONNRESET",
+    "net::ERR_CONNECTION_CLOSED",
+    "net::ERR_CONNECTION_RESET",
+    "net::ERR_EMPTY_RESPONSE",
+    "net::ERR_NETWORK_CHANGED",
+    "net::ERR_TIMED_OUT",
+)
+
+T = TypeVar("T")
+
+# Timeout (ms) of the attempt running in this task, read by the page helpers
+_ATTEMPT_TIMEOUT: ContextVar[int] = ContextVar("attempt_timeout", default=TIMEOUT_MAX)
+
+
+def attempt_timeout() -> int:
+    """Timeout in ms for page operations of the current attempt"""
+    return _ATTEMPT_TIMEOUT.get()
+
+
+def set_attempt_timeout(timeout: int):
+    """Sets what attempt_timeout() returns, for page work run outside RetryPolicy.run()"""
+    _ATTEMPT_TIMEOUT.set(timeout)
+
+
+def is_retryable(error: BaseException) -> bool:
+    if is_timeout_error(error):
+        return True
+    if is_playwright_error(error):
+        message = str(error)
+        return any(m in message for m in RETRYABLE_MESSAGES)
+    return False
+
+
+class LatencyWindow:
+    """The last LATENCY_WINDOW attempt durations of one kind, in seconds"""
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Nearest-rank percentile, or None until LATENCY_MIN_SAMPLES are in"""
+        if len(self._samples) < LATENCY_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class RetryPolicy:
+    """Runs scrape attempts with adaptive timeouts, retries and hedging"""
+
+    def __init__(self, has_capacity: Callable[[], bool] = lambda: True,
+                 attempts: int = RETRY_ATTEMPTS, hedging: bool = HEDGE_SCRAPES):
+        self.has_capacity = has_capacity
+        self.attempts = max(1, attempts)
+        self.hedging = hedging
+        self._windows: Dict[str, LatencyWindow] = {}
+        self.started = 0
+        self.hedges: Dict[str, int] = {}
+        self.hedges_won: Dict[str, int] = {}
+
+    def _window(self, kind: str) -> LatencyWindow:
+        window = self._windows.get(kind)
+        if window is None:
+            window = self._windows[kind] = LatencyWindow()
+        return window
+
+    def timeout(self, kind: str) -> int:
+        """Current timeout in ms for one attempt of kind"""
+        window = self._windows.get(kind)
+        p99 = window.percentile(0.99) if window is not None else None
+        if p99 is None:
+            return COLD_TIMEOUTS.get(kind, TIMEOUT_MAX)
+        return int(min(TIMEOUT_MAX, max(TIMEOUT_MIN, p99 * 1000 * TIMEOUT_MULTIPLIER)))
+
+    def _hedge_delay(self, kind: str) -> Optional[float]:
+        window = self._windows.get(kind)
+        if not self.hedging or window is None:
+            return None
+        return window.percentile(0.95)
+
+    def _may_hedge(self) -> bool:
+        return sum(self.hedges.values()) < HEDGE_BUDGET * self.started and self.has_capacity()
+
+    async def _timed(self, kind: str, attempt: Callable[[], Awaitable[T]], timeout: int) -> T:
+        self.started += 1
+        _ATTEMPT_TIMEOUT.set(timeout)
+        started = time.monotonic()
+        try:
+            result = await attempt()
+        except Exception as e:
+            if is_timeout_error(e):
+                self._window(kind).observe(time.monotonic() - started)
+            raise
+        self._window(kind).observe(time.monotonic() - started)
+        return result
+
+    async def _hedged(self, kind: str, attempt: Callable[[], Awaitable[T]], timeout: int) -> T:
+        """One attempt, plus a second on a fresh page if the first outlives the p95"""
+        first = asyncio.create_task(self._timed(kind, attempt, timeout))
+        tasks = {first}
+        try:
+            delay = self._hedge_delay(kind)
+            if delay is None:
+                return await first
+            await asyncio.wait(tasks, timeout=delay)
+            if first.done() or not self._may_hedge():
+                return await first
+
+            hedge = asyncio.create_task(self._timed(kind, attempt, timeout))
+            tasks.add(hedge)
+            self.hedges[kind] = self.hedges.get(kind, 0) + 1
+            errors = []
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        won = task is hedge
+                        if won:
+                            self.hedges_won[kind] = self.hedges_won.get(kind, 0) + 1
+                        metrics.SCRAPE_HEDGES.inc(kind=kind, outcome="won" if won else "lost")
+                        return task.result()
+                    errors.append(task.exception())
+            metrics.SCRAPE_HEDGES.inc(kind=kind, outcome="failed")
+            raise errors[0]
+        finally:
+            # The slower attempt is abandoned; its page goes back to the pool
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def run(self, kind: str, attempt: Callable[[], Awaitable[T]]) -> T:
+        """Result of the first successful attempt; the last error if none succeeds.
+
+        attempt() must check out its own page, so retries and hedges never
+        share one. Terminal errors are raised immediately.
+        """
+        deadline = time.monotonic() + SCRAPE_DEADLINE / 1000
+        n = 0
+        while True:
+            remaining = int((deadline - time.monotonic()) * 1000)
+            try:
+                return await self._hedged(kind, attempt, min(self.timeout(kind), remaining))
+            except Exception as e:
+                n += 1
+                if not is_retryable(e) or n >= self.attempts:
+                    raise
+                backoff = random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** (n - 1)))
+                if deadline - time.monotonic() - backoff < TIMEOUT_MIN / 1000:
+                    raise
+                reason = str(e).splitlines()[0] if str(e) else type(e).__name__
+                print(f"⚠️ {kind} scrape failed ({reason}), retrying in {backoff:.2f}s "
+                      f"(attempt {n + 1}/{self.attempts})")
+                metrics.SCRAPE_RETRIES.inc(kind=kind)
+                await asyncio.sleep(backoff)
+
+    def stats(self) -> Dict[str, Any]:
+        kinds = {}
+        for kind, window in self._windows.items():
+            p50, p95, p99 = (window.percentile(q) for q in (0.5, 0.95, 0.99))
+            kinds[kind] = {
+                "samples": len(window),
+                "p50": round(p50, 3) if p50 is not None else None,
+                "p95": round(p95, 3) if p95 is not None else None,
+                "p99": round(p99, 3) if p99 is not None else None,
+                "timeoutMs": self.timeout(kind),
+                "hedges": self.hedges.get(kind, 0),
+                "hedgesWon": self.hedges_won.get(kind, 0),
+            }
+        return {"attempts": self.started, "hedging": self.hedging, "kinds": kinds}
@@ -1,324 +1,858 @@
-import re
 import asyncio
 import os
-from typing import Dict, Any, Optional
-from playwright.async_api import async_playwright, Browser, Playwright, Error as PlaywrightError
+import sqlite3
+import time
+from typing import TYPE_CHECKING, Dict, Any, AsyncIterator, Awaitable, Callable, Iterable, List, Optional
 
+import admission
+from admission import AdmissionScheduler, Overloaded
+from cache import IN_BACKGROUND_REFRESH, LRUCache, ResultCache
+from coalesce import Broadcast, SingleFlight
+import fastjson
+from fastpath import HTTP_FAST_PATH, close_http_client, fetch_page, parse_potd, parse_profile, parse_stats
+from fleet import BROWSER_WARMUP, BrowserFleet, FleetUnavailable
+from history import HISTORY_DB, HISTORY_MAX_POINTS, HistoryStore
+from jobs import SCRAPE_QUEUE, Job, JobClient
+from lazy_playwright import is_playwright_error
+from leaderboard import (
+    LEADERBOARD_MAX_GROUPS, LEADERBOARD_MAX_MEMBERS, LEADERBOARD_SYNC_INTERVAL, GroupStore, Leaderboards,
+)
+import metrics
+from metrics import phase
+from negative import NOT_FOUND_ERROR, NegativeCache, is_confirmed_miss, is_login_redirect
+from refresher import REFRESH_ENABLED, PopularityTracker, RefreshScheduler
+from retry import RetryPolicy, attempt_timeout, set_attempt_timeout
+from specs import (
+    PAGE_READY, PROBLEM_LIST, PROBLEM_LIST_SPEC, PROFILE_SPEC, STATS_SPEC, TABS_SPEC, problem_tab,
+)
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
 
-# Configuration
-BROWSERLESS_TOKEN = os.environ.get("BROWSERLESS_TOKEN", "")
-BROWSER_URL = f"wss://chrome.browserless.io?token={BROWSERLESS_TOKEN}"
 
-GFG_BASE_URL = "https://www.geeksforgeeks.org/profile"
-TIMEOUT_STD = 45000 
-TIMEOUT_SHORT = 30000
+# Configuration
+GFG_BASE_URL = os.environ.get("GFG_BASE_URL", "https://www.geeksforgeeks.org/profile")
+TIMEOUT_READY = 15000
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "8"))
+BATCH_SHED_DEADLINE = float(os.environ.get("BATCH_SHED_DEADLINE", "60"))
+PROBLEM_SETS_MAX_USERS = int(os.environ.get("PROBLEM_SETS_MAX_USERS", "1000"))
 
 # Global State
-_PLAYWRIGHT: Optional[Playwright] = None
-_BROWSER: Optional[Browser] = None
-_LOCK = asyncio.Lock()
-_REQUEST_COUNT = 0
-_MAX_REQUESTS_PER_BROWSER = 50  # Lower threshold for stability
-
-async def is_browser_connected(browser: Browser) -> bool:
-    """Check if browser is still connected and usable"""
-    try:
-        # Try to get contexts - will fail if browser is closed
-        contexts = browser.contexts
-        return len(contexts) >= 0  # If we can access contexts, browser is alive
-    except Exception:
-        return False
+_FLEET = BrowserFleet()
+_CACHE = ResultCache()
+_FLIGHTS = SingleFlight()
+_ADMISSION = AdmissionScheduler()
+_BUNDLE_KINDS = ("profile", "stats", "problems")
+_PROBLEM_SETS = LRUCache(PROBLEM_SETS_MAX_USERS)  # last extracted lists, for incremental refresh
+_POPULARITY = PopularityTracker()
+_JOBS = JobClient() if SCRAPE_QUEUE else None  # scrapes run on worker.py instead of here
+_HISTORY = HistoryStore() if HISTORY_DB else None
+_LEADERBOARDS = Leaderboards()
+_GROUPS = GroupStore(HISTORY_DB) if HISTORY_DB else None  # shared group definitions; else per-process memory
+_LEADERBOARD_SYNC = asyncio.Lock()
+_LEADERBOARDS_SYNCED = 0.0  # monotonic time of the last sync with the store
+_SNAPSHOTS_APPLIED: Optional[float] = None  # snapshots recorded up to here are in the indexes
+_NEGATIVE = NegativeCache()
+_RETRY = RetryPolicy(has_capacity=lambda: _FLEET.has_capacity())
+_STREAMS: Dict[str, Broadcast] = {}  # cache key -> chunks of a live /problems crawl
+_SEEDING: Dict[str, asyncio.Task] = {}  # group -> background scrape of members with no data
+_WARMUP: Optional[asyncio.Task] = None
 
-async def get_browser() -> Browser:
-    """Connects to Browserless via CDP with health check and auto-recovery"""
-    global _PLAYWRIGHT, _BROWSER, _REQUEST_COUNT
-    
-    async with _LOCK:
-        # Check if browser needs refresh
-        needs_new_browser = (
-            _BROWSER is None or
-            _REQUEST_COUNT >= _MAX_REQUESTS_PER_BROWSER or
-            not await is_browser_connected(_BROWSER)
-        )
-        
-        if needs_new_browser:
-            # Clean up old browser if exists
-            if _BROWSER:
-                try:
-                    await _BROWSER.close()
-                except Exception as e:
-                    print(f"⚠️ Error closing old browser: {e}")
-                _BROWSER = None
-            
-            _REQUEST_COUNT = 0
-            
-            # Create new connection
-            print("🚀 Connecting to Remote Browserless...")
-            try:
-                if _PLAYWRIGHT is None:
-                    _PLAYWRIGHT = await async_playwright().start()
-                
-                _BROWSER = await _PLAYWRIGHT.chromium.connect_over_cdp(
-                    BROWSER_URL,
-                    timeout=30000  # 30 second connection timeout
-                )
-                print("✅ Browser connected successfully")
-            except Exception as e:
-                print(f"❌ Failed to connect to browser: {e}")
-                _BROWSER = None
-                raise
-        
-        _REQUEST_COUNT += 1
-    
-    return _BROWSER
+# Counters the components keep themselves, exported at /metrics
+metrics.Counter(
+    "gfg_cache_requests_total", "Result cache lookups by outcome", ("result",),
+    func=lambda: {("hit",): _CACHE.hits, ("stale",): _CACHE.stale_hits, ("miss",): _CACHE.misses}
+)
+metrics.Counter(
+    "gfg_coalesced_requests_total", "Callers that joined an in-flight scrape",
+    func=lambda: {(): _FLIGHTS.coalesced}
+)
+metrics.Counter(
+    "gfg_negative_cache_hits_total", "Requests answered without scraping: malformed usernames and remembered misses",
+    ("source",),
+    func=lambda: {("invalid",): _NEGATIVE.rejected, ("exact",): _NEGATIVE.exact_hits, ("bloom",): _NEGATIVE.bloom_hits}
+)
+metrics.Counter(
+    "gfg_browser_connects_total", "CDP connections opened to the browser",
+    func=lambda: {(): _FLEET.connects}
+)
+metrics.Counter(
+    "gfg_browser_recycles_total", "Pooled pages retired after reaching their use limit",
+    func=lambda: {(): _FLEET.recycled}
+)
+metrics.Gauge(
+    "gfg_browser_sessions_open", "Pooled pages currently checked out by a scrape",
+    func=lambda: {(): _FLEET.in_use}
+)
+metrics.Gauge(
+    "gfg_browser_endpoint_up", "1 while the endpoint's circuit breaker is closed", ("endpoint",),
+    func=lambda: {(m.label,): int(m.breaker.closed) for m in _FLEET.members}
+)
+metrics.Counter(
+    "gfg_browser_endpoint_trips_total", "Times the endpoint's circuit breaker opened", ("endpoint",),
+    func=lambda: {(m.label,): m.breaker.trips for m in _FLEET.members}
+)
+metrics.Counter(
+    "gfg_admission_rejected_total", "Scrapes shed by admission control", ("class",),
+    func=lambda: {(c.name,): c.rejected for c in _ADMISSION.classes.values()}
+)
+metrics.Gauge(
+    "gfg_scrape_timeout_seconds", "Current adaptive timeout of one scrape attempt", ("kind",),
+    func=lambda: {(kind,): _RETRY.timeout(kind) / 1000 for kind in _RETRY.stats()["kinds"]}
+)
+metrics.Gauge(
+    "gfg_admission_queued", "Scrapes waiting for admission", ("class",),
+    func=lambda: {(c.name,): c.queued for c in _ADMISSION.classes.values()}
+)
+
+def start_warmup(owns_browsers: Optional[bool] = None):
+    """Connects the browser fleet and fills its pools in the background.
+
+    Playwright itself is only imported here (or on the first browser scrape),
+    so importing the app stays cheap. API processes that hand scrapes to
+    workers own no browsers and skip this unless owns_browsers says otherwise.
+    """
+    global _WARMUP
+    owns_browsers = _JOBS is None if owns_browsers is None else owns_browsers
+    if BROWSER_WARMUP and owns_browsers and _WARMUP is None:
+        _WARMUP = asyncio.create_task(_FLEET.warm())
+
+def readiness() -> Dict[str, Any]:
+    """Whether this process can serve browser scrapes without paying for a cold connect"""
+    if _JOBS is not None:
+        browsers, ready = "worker", True
+    elif not BROWSER_WARMUP:
+        browsers, ready = "lazy", True
+    else:
+        ready = _FLEET.ready
+        browsers = "warm" if ready else "warming"
+    return {
+        "ready": ready,
+        "browsers": browsers,
+        "endpoints": [{"endpoint": m.label, "warm": m.warm, "state": m.breaker.state} for m in _FLEET.members],
+    }
 
 async def close_browser():
     """Cleanup resources on shutdown"""
-    global _PLAYWRIGHT, _BROWSER, _REQUEST_COUNT
-    async with _LOCK:
-        if _BROWSER:
-            try:
-                await _BROWSER.close()
-            except Exception as e:
-                print(f"⚠️ Error during browser cleanup: {e}")
-            _BROWSER = None
-        
-        if _PLAYWRIGHT:
-            try:
-                await _PLAYWRIGHT.stop()
-            except Exception as e:
-                print(f"⚠️ Error during playwright cleanup: {e}")
-            _PLAYWRIGHT = None
-        
-        _REQUEST_COUNT = 0
+    if _WARMUP is not None:
+        _WARMUP.cancel()
+    for task in list(_SEEDING.values()):
+        task.cancel()
+    await close_http_client()
+    await _FLEET.close()
     print("🛑 Remote Browser Disconnected")
 
+def scraper_status() -> Dict[str, Any]:
+    """Cache, coalescing, browser fleet and traffic counters for the status endpoint"""
+    return {
+        "cache": _CACHE.stats(),
+        "coalescing": _FLIGHTS.stats(),
+        "browsers": _FLEET.status(),
+        "traffic": _FLEET.traffic_stats(),
+        "admission": _ADMISSION.stats(),
+        "refresher": _REFRESHER.status(),
+        "jobs": _JOBS.stats() if _JOBS else None,
+        "history": _HISTORY.stats() if _HISTORY else None,
+        "leaderboards": _LEADERBOARDS.stats(),
+        "retry": _RETRY.stats(),
+        "negativeCache": _NEGATIVE.stats(),
+    }
+
+async def _run_scrape(
+    username: str,
+    error_label: str,
+    extract: Callable[["Page"], Awaitable[Dict[str, Any]]],
+    admission_class: str,
+) -> Dict[str, Any]:
+    """Runs extract() on a pooled page under the retry policy.
+
+    The scrape first has to be admitted; admission.Overloaded propagates to
+    the caller, as does FleetUnavailable while every browser endpoint is ejected.
+    """
+    kind = admission_class
+    if IN_BACKGROUND_REFRESH.get():
+        admission_class = "background"
+    else:
+        admission_class = admission.endpoint_class(admission_class)
+
+    started = time.perf_counter()
+    try:
+        async with _ADMISSION.admit(admission_class):
+            return await _run_admitted(username, error_label, extract, kind)
+    finally:
+        metrics.SCRAPE_SECONDS.observe(time.perf_counter() - started, kind=kind)
+
+async def _attempt(extract: Callable[["Page"], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    # Checkout health-checks pages and skips ejected endpoints, so every attempt gets a fresh page
+    async with _FLEET.page() as page:
+        return await extract(page)
+
+async def _run_admitted(
+    username: str,
+    error_label: str,
+    extract: Callable[["Page"], Awaitable[Dict[str, Any]]],
+    kind: str,
+) -> Dict[str, Any]:
+    try:
+        return await _RETRY.run(kind, lambda: _attempt(extract))
+    except FleetUnavailable:
+        raise
+    except Exception as e:
+        if is_playwright_error(e):
+            return {"error": f"Browser error: {str(e)}", "userName": username}
+        return {"error": f"{error_label}: {str(e)}", "userName": username}
+
+async def _load(page: "Page", url: str, timeout: int) -> bool:
+    """Navigates to url and waits for the page root instead of network idle.
+
+    Returns False when the page redirected to login (user not found or
+    private). Only PAGE_READY is waited for, since a new user may have no
+    score cards or navbar; a page whose root never appears raises
+    Playwright's TimeoutError, so the retry policy treats it as stuck rather
+    than the user as having no data.
+    """
+    with phase("goto"):
+        await page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+    if is_login_redirect(page.url):
+        return False
+    with phase("selector_wait"):
+        await page.wait_for_selector(PAGE_READY, state="attached", timeout=min(timeout, TIMEOUT_READY))
+    return True
+
 # --- Scraper Functions with Better Error Handling ---
 
-async def fetch_user_profile(username: str) -> Dict[str, Any]:
-    """Fetch user profile with retry logic"""
+async def _read_profile(page: "Page", username: str) -> Dict[str, Any]:
+    """Reads the profile header and score cards from an already loaded profile page"""
+    raw = await PROFILE_SPEC.extract(page)
+    return {
+        "userName": username,
+        "fullName": raw["fullName"] or username,
+        "designation": raw["designation"],
+        "codingScore": 0,
+        "problemsSolved": 0,
+        "instituteRank": 0,
+        "articlesPublished": 0,
+        "potdStreak": 0,
+        "longestStreak": 0,
+        "potdsSolved": 0,
+        **raw["scores"],
+        **parse_potd(raw["nextData"])
+    }
+
+async def _extract_user_profile(page: "Page", username: str) -> Dict[str, Any]:
     url = f"{GFG_BASE_URL}/{username}"
-    
-    max_retries = 2
-    for attempt in range(max_retries):
-        context = None
-        page = None
-        
-        try:
-            browser = await get_browser()
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            )
-            page = await context.new_page()
-
-            await page.goto(url, wait_until="networkidle", timeout=TIMEOUT_SHORT)
-            
-            if "auth" in page.url:
-                return {"error": "User not found or private profile", "userName": username}
-
-            data = {
-                "userName": username,
-                "fullName": username,
-                "designation": "",
-                "codingScore": 0,
-                "problemsSolved": 0,
-                "instituteRank": 0,
-                "articlesPublished": 0,
-                "potdStreak": 0,
-                "longestStreak": 0,
-                "potdsSolved": 0
-            }
-
-            # Safe extraction with null checks
-            if await page.locator(".NewProfile_name__N_Nlw").count() > 0:
-                name = await page.locator(".NewProfile_name__N_Nlw").first.text_content()
-                data["fullName"] = name.strip() if name else username
-            
-            if await page.locator(".NewProfile_designation__fujtZ").count() > 0:
-                designation = await page.locator(".NewProfile_designation__fujtZ").first.text_content()
-                data["designation"] = designation.strip() if designation else ""
-
-            # Score Cards
-            cards = page.locator(".ScoreContainer_score-card__zI4vG")
-            for i in range(await cards.count()):
-                card = cards.nth(i)
-                label = await card.locator(".ScoreContainer_label__aVpLE").text_content()
-                val = await card.locator(".ScoreContainer_value__7yy7h").text_content()
-                if label and val and val.strip() != "__":
-                    try:
-                        num = int(val.strip())
-                        if "Coding Score" in label: data["codingScore"] = num
-                        elif "Problems Solved" in label: data["problemsSolved"] = num
-                        elif "Institute Rank" in label: data["instituteRank"] = num
-                        elif "Articles Published" in label: data["articlesPublished"] = num
-                    except ValueError:
-                        continue
+    if not await _load(page, url, attempt_timeout()):
+        return {"error": NOT_FOUND_ERROR, "userName": username}
+
+    with phase("extract"):
+        return await _read_profile(page, username)
 
+async def _scrape_user_profile(username: str) -> Dict[str, Any]:
+    """Fetch user profile, over plain HTTP when possible, else in the browser with retry logic"""
+    if HTTP_FAST_PATH:
+        soup = await fetch_page(f"{GFG_BASE_URL}/{username}")
+        data = parse_profile(soup, username) if soup else None
+        if data is not None:
             return data
-            
-        except PlaywrightError as e:
-            error_msg = str(e)
-            if "Target" in error_msg and "closed" in error_msg and attempt < max_retries - 1:
-                print(f"⚠️ Browser connection lost, retrying... (attempt {attempt + 1}/{max_retries})")
-                # Force browser reconnection
-                global _BROWSER
-                _BROWSER = None
-                await asyncio.sleep(1)  # Brief delay before retry
-                continue
-            return {"error": f"Browser error: {error_msg}", "userName": username}
-        except Exception as e:
-            return {"error": f"Scraping failed: {str(e)}", "userName": username}
-        finally:
-            # Always clean up context and page
-            try:
-                if page:
-                    await page.close()
-                if context:
-                    await context.close()
-            except Exception as e:
-                print(f"⚠️ Cleanup error: {e}")
+    return await _run_scrape(
+        username, "Scraping failed", lambda page: _extract_user_profile(page, username), "profile"
+    )
 
-async def get_gfg_data(username: str) -> Dict[str, Any]:
-    """Retrieves quick stats by difficulty with retry logic"""
+async def _read_stats(page: "Page", username: str) -> Dict[str, Any]:
+    """Reads the difficulty counts from an already loaded activity tab"""
+    numbers = (await STATS_SPEC.extract(page))["counts"]
+    if numbers is None:
+        return {"error": "Stats not found", "userName": username}
+
+    tags = ["School", "Basic", "Easy", "Medium", "Hard"]
+
+    stats = {tags[i]: int(numbers[i]) for i in range(min(len(numbers), 5))}
+    return {
+        "userName": username,
+        "totalProblemsSolved": sum(stats.values()),
+        **stats  # Flatten stats into response
+    }
+
+async def _extract_gfg_data(page: "Page", username: str) -> Dict[str, Any]:
     url = f"{GFG_BASE_URL}/{username}?tab=activity"
-    
-    max_retries = 2
-    for attempt in range(max_retries):
-        context = None
-        page = None
-        
+    if not await _load(page, url, attempt_timeout()):
+        return {"error": NOT_FOUND_ERROR, "userName": username}
+
+    with phase("extract"):
+        return await _read_stats(page, username)
+
+async def _scrape_gfg_data(username: str) -> Dict[str, Any]:
+    """Retrieves quick stats by difficulty, over plain HTTP when possible, else in the browser"""
+    if HTTP_FAST_PATH:
+        soup = await fetch_page(f"{GFG_BASE_URL}/{username}?tab=activity")
+        data = parse_stats(soup, username) if soup else None
+        if data is not None:
+            return data
+    return await _run_scrape(
+        username, "Stats fetch failed", lambda page: _extract_gfg_data(page, username), "stats"
+    )
+
+async def _known_problem_sets(username: str) -> Dict[str, Any]:
+    """Last extracted problem lists for a user, from the incremental store or the result cache"""
+    known = _PROBLEM_SETS.get(username)
+    if known is None:
+        entry = await _CACHE.lookup("problems", username)
+        known = entry.value if entry is not None else None
+    return known or {"problemsByDifficulty": {}, "Problems": {}}
+
+async def _iter_problem_list(page: "Page", username: str) -> AsyncIterator[Dict[str, Any]]:
+    """Clicks through the difficulty tabs of an already loaded activity tab.
+
+    Yields the per-difficulty counts first, then one chunk per difficulty as
+    soon as its list is extracted (or an error dict instead of the counts).
+    Only tabs whose solved count changed since the last extraction are
+    clicked; the others reuse the stored list for that difficulty.
+    """
+    difficulties = ["SCHOOL", "BASIC", "EASY", "MEDIUM", "HARD"]
+    all_problems = {}
+    total_problems = {}
+
+    navbar = await TABS_SPEC.extract(page)
+    if navbar["navbar"] is None:
+        yield {"error": "Activity tab content not found", "userName": username}
+        return
+
+    for diff in difficulties:
+        # First tab whose label mentions the difficulty, like :has-text()
+        tab = next((t for t in navbar["tabs"] if diff in t["label"].upper()), None)
+        total_problems[diff.capitalize()] = tab["count"] if tab else 0
+
+    yield {"userName": username, "problemsByDifficulty": total_problems}
+
+    known = await _known_problem_sets(username)
+    extracted = {}
+
+    for diff in difficulties:
+        name = diff.capitalize()
+        count = total_problems[name]
+
+        if count == 0:
+            all_problems[name] = []
+            extracted[name] = count
+            yield {"difficulty": name, "problems": []}
+            continue
+
+        previous = known["Problems"].get(name)
+        if known["problemsByDifficulty"].get(name) == count and previous:
+            all_problems[name] = previous
+            extracted[name] = count
+            yield {"difficulty": name, "problems": previous}
+            continue
+
+        await page.locator(problem_tab(diff)).first.click()
+
         try:
-            browser = await get_browser()
-            context = await browser.new_context()
-            page = await context.new_page()
-            
-            await page.goto(url, wait_until="networkidle", timeout=TIMEOUT_SHORT)
-            
-            navbar = page.locator('.ProblemNavbar_head__6ptDV')
-            if await navbar.count() == 0:
-                return {"error": "Stats not found", "userName": username}
-
-            text = await navbar.inner_text()
-            numbers = re.findall(r'\((\d+)\)', text)
-            tags = ["School", "Basic", "Easy", "Medium", "Hard"]
-            
-            stats = {tags[i]: int(numbers[i]) for i in range(min(len(numbers), 5))}
-            return {
-                "userName": username,
-                "totalProblemsSolved": sum(stats.values()),
-                **stats  # Flatten stats into response
-            }
-            
-        except PlaywrightError as e:
-            error_msg = str(e)
-            if "Target" in error_msg and "closed" in error_msg and attempt < max_retries - 1:
-                print(f"⚠️ Browser connection lost, retrying... (attempt {attempt + 1}/{max_retries})")
-                global _BROWSER
-                _BROWSER = None
-                await asyncio.sleep(1)
-                continue
-            return {"error": f"Browser error: {error_msg}", "userName": username}
-        except Exception as e:
-            return {"error": f"Stats fetch failed: {str(e)}", "userName": username}
-        finally:
-            try:
-                if page:
-                    await page.close()
-                if context:
-                    await context.close()
-            except Exception as e:
-                print(f"⚠️ Cleanup error: {e}")
+            await page.wait_for_selector(PROBLEM_LIST, timeout=attempt_timeout())
+            problems = (await PROBLEM_LIST_SPEC.extract(page))["problems"]
 
-async def fetch_problem_list(username: str) -> Dict[str, Any]:
+            all_problems[name] = problems
+            extracted[name] = count
+
+        except Exception:
+            print(f"⚠️ Could not load problem list for {diff}")
+            all_problems[name] = []
+
+        yield {"difficulty": name, "problems": all_problems[name]}
+
+    # Failed tabs are left out of the stored counts so the next refresh retries them
+    _PROBLEM_SETS.set(username, {"problemsByDifficulty": extracted, "Problems": all_problems})
+
+async def _read_problem_list(page: "Page", username: str) -> Dict[str, Any]:
+    """Collects _iter_problem_list into the /problems response shape"""
+    result: Dict[str, Any] = {}
+    problems: Dict[str, Any] = {}
+    async for chunk in _iter_problem_list(page, username):
+        if "difficulty" in chunk:
+            problems[chunk["difficulty"]] = chunk["problems"]
+        else:
+            result = chunk
+    if "error" in result:
+        return result
+    return {**result, "Problems": problems}
+
+async def _extract_problem_list(page: "Page", username: str) -> Dict[str, Any]:
+    url = f"{GFG_BASE_URL}/{username}?tab=activity"
+    if not await _load(page, url, attempt_timeout()):
+        return {"error": NOT_FOUND_ERROR, "userName": username}
+
+    with phase("extract"):
+        return await _read_problem_list(page, username)
+
+async def _scrape_problem_list(username: str) -> Dict[str, Any]:
     """Fetch problem list with retry logic"""
+    return await _run_scrape(
+        username, "Failed to fetch problem list", lambda page: _extract_problem_list(page, username),
+        "problems"
+    )
+
+async def _extract_user_bundle(page: "Page", username: str, include_problems: bool) -> Dict[str, Any]:
     url = f"{GFG_BASE_URL}/{username}?tab=activity"
-    
-    max_retries = 2
-    for attempt in range(max_retries):
-        context = None
-        page = None
-        
+    if not await _load(page, url, attempt_timeout()):
+        return {"error": NOT_FOUND_ERROR, "userName": username}
+
+    with phase("extract"):
+        bundle = {
+            "userName": username,
+            "profile": await _read_profile(page, username),
+            "stats": await _read_stats(page, username),
+        }
+        if include_problems:
+            bundle["problems"] = await _read_problem_list(page, username)
+    return bundle
+
+async def _scrape_bundle_parts(username: str, include_problems: bool) -> Dict[str, Any]:
+    """Profile, stats and optionally problem lists from a single navigation"""
+    bundle = None
+    if HTTP_FAST_PATH and not include_problems:
+        soup = await fetch_page(f"{GFG_BASE_URL}/{username}?tab=activity")
+        profile = parse_profile(soup, username) if soup else None
+        stats = parse_stats(soup, username) if soup else None
+        if profile is not None and stats is not None:
+            bundle = {"userName": username, "profile": profile, "stats": stats}
+    if bundle is None:
+        bundle = await _run_scrape(
+            username, "Scraping failed",
+            lambda page: _extract_user_bundle(page, username, include_problems),
+            "problems" if include_problems else "profile"
+        )
+    return bundle
+
+async def _scrape_user_bundle(username: str, include_problems: bool) -> Dict[str, Any]:
+    """Scrapes a bundle and fans its parts out to the per-endpoint caches"""
+    bundle = await _scrape("bundle", username, include_problems=include_problems)
+    if "error" not in bundle:
+        for kind in _BUNDLE_KINDS:
+            if kind in bundle:
+                await _CACHE.store(kind, username, bundle[kind])
+    return bundle
+
+# --- Scrape Dispatch ---
+
+_LOCAL_SCRAPERS = {
+    "profile": _scrape_user_profile,
+    "stats": _scrape_gfg_data,
+    "problems": _scrape_problem_list,
+    "bundle": _scrape_bundle_parts,
+}
+
+def _default_class(kind: str, params: Dict[str, Any]) -> str:
+    if kind == "bundle":
+        return "problems" if params.get("include_problems") else "profile"
+    return kind
+
+async def _record_result(kind: str, username: str, result: Dict[str, Any]):
+    """Feeds a finished scrape to the negative cache, the history store and the leaderboard indexes"""
+    if is_confirmed_miss(result):
+        _NEGATIVE.add(username, result["error"])
+        return
+    if "error" in result:
+        return
+    _NEGATIVE.clear(username)
+    parts = {part: result[part] for part in ("profile", "stats")} if kind == "bundle" else {kind: result}
+    for part, value in parts.items():
+        _LEADERBOARDS.observe(part, username, value)
+        if _HISTORY is not None:
+            await _HISTORY.record(part, username, value)
+
+async def _scrape(kind: str, username: str, **params: Any) -> Dict[str, Any]:
+    """Runs a scrape in this process, or as a job on a scrape worker when SCRAPE_QUEUE is set"""
+    if _JOBS is None:
+        result = await _LOCAL_SCRAPERS[kind](username, **params)
+    else:
+        if IN_BACKGROUND_REFRESH.get():
+            endpoint_class = "background"
+        else:
+            endpoint_class = admission.endpoint_class(_default_class(kind, params))
+        result = await _JOBS.run(kind, username, params, endpoint_class)
+    await _record_result(kind, username, result)
+    return result
+
+async def run_job(job: Job) -> Dict[str, Any]:
+    """Runs a queued job on a scrape worker, at the priority of the request that queued it"""
+    if job.endpoint_class == "background":
+        IN_BACKGROUND_REFRESH.set(True)
+    else:
+        admission.set_endpoint_class(job.endpoint_class)
+    return await _LOCAL_SCRAPERS[job.kind](job.username, **job.params)
+
+# --- Cached Public API ---
+
+def _rejected(username: str) -> Optional[Dict[str, Any]]:
+    """Error result for a malformed username or a remembered miss, answered without scraping"""
+    error = _NEGATIVE.check(username)
+    return {"error": error, "userName": username} if error else None
+
+async def _scrape_and_store(kind: str, username: str) -> Dict[str, Any]:
+    result = await _scrape(kind, username)
+    await _CACHE.store(kind, username, result)
+    return result
+
+async def _fetch(kind: str, username: str) -> Dict[str, Any]:
+    """One in-flight scrape per key; its result is cached once, by the flight, not by each waiter"""
+    return await _FLIGHTS.do(ResultCache.key(kind, username), lambda: _scrape_and_store(kind, username))
+
+async def _cached(kind: str, username: str) -> Dict[str, Any]:
+    """Serves from the result cache; misses and refreshes share one in-flight scrape per key"""
+    return await _CACHE.get_or_fetch(kind, username, lambda: _fetch(kind, username))
+
+async def fetch_user_profile(username: str) -> Dict[str, Any]:
+    """Profile data, served from the result cache when possible"""
+    rejected = _rejected(username)
+    if rejected:
+        return rejected
+    _POPULARITY.record("profile", username)
+    return await _cached("profile", username)
+
+async def get_gfg_data(username: str) -> Dict[str, Any]:
+    """Difficulty stats, served from the result cache when possible"""
+    rejected = _rejected(username)
+    if rejected:
+        return rejected
+    _POPULARITY.record("stats", username)
+    return await _cached("stats", username)
+
+async def fetch_problem_list(username: str) -> Dict[str, Any]:
+    """Solved problem list, served from the result cache when possible"""
+    rejected = _rejected(username)
+    if rejected:
+        return rejected
+    return await _cached("problems", username)
+
+async def encoded_result(kind: str, username: str, value: Dict[str, Any]) -> bytes:
+    """value as JSON bytes, encoded once and kept with its cache entry when value is the cached result"""
+    entry = await _CACHE.lookup(kind, username)
+    if entry is not None and entry.value is value:
+        return entry.json()
+    return fastjson.dumps(value)
+
+async def fetch_user_bundle(username: str, include_problems: bool = False) -> Dict[str, Any]:
+    """Profile, stats and (optionally) problem lists, scraped together in one navigation.
+
+    Served straight from the per-endpoint caches when every part is fresh;
+    otherwise one navigation refreshes all parts at once.
+    """
+    rejected = _rejected(username)
+    if rejected:
+        return rejected
+    kinds = _BUNDLE_KINDS if include_problems else _BUNDLE_KINDS[:2]
+    now = time.time()
+    bundle: Dict[str, Any] = {"userName": username}
+    for kind in kinds:
+        entry = await _CACHE.lookup(kind, username)
+        if entry is None or not entry.is_fresh(now):
+            break
+        bundle[kind] = entry.value
+    else:
+        return bundle
+
+    flight_kind = "bundle+problems" if include_problems else "bundle"
+    return await _FLIGHTS.do(
+        ResultCache.key(flight_kind, username),
+        lambda: _scrape_user_bundle(username, include_problems)
+    )
+
+async def fetch_history(
+    username: str, kind: str, since: Optional[float] = None, until: Optional[float] = None,
+    points: int = HISTORY_MAX_POINTS,
+) -> Optional[List[Dict[str, Any]]]:
+    """Recorded stats or profile snapshots, straight from the history store; None if it is disabled"""
+    if _HISTORY is None:
+        return None
+    return await _HISTORY.query(kind, username, since, until, points)
+
+async def _fetch_when_admitted(fetch: Callable[[str], Awaitable[Dict[str, Any]]], username: str) -> Dict[str, Any]:
+    """fetch(username), waiting out shed load for up to BATCH_SHED_DEADLINE seconds.
+
+    Batch callers bound their own load, so being shed is worth a wait, not
+    a failure. A fleet with no healthy endpoint will not recover within a
+    batch, so it is reported at once. Either way the result is an error
+    dict with retryAfter rather than an exception.
+    """
+    deadline = time.monotonic() + BATCH_SHED_DEADLINE
+    while True:
+        try:
+            return await fetch(username)
+        except Overloaded as e:
+            if isinstance(e, FleetUnavailable) or time.monotonic() + e.retry_after > deadline:
+                return {"error": str(e), "userName": username, "retryAfter": e.retry_after}
+            await asyncio.sleep(e.retry_after)
+
+async def stream_batch(
+    fetch: Callable[[str], Awaitable[Dict[str, Any]]],
+    usernames: Iterable[str],
+    concurrency: int = BATCH_CONCURRENCY,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Runs fetch() for many users with bounded concurrency, yielding each result as it completes"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(username: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return await _fetch_when_admitted(fetch, username)
+            except Exception as e:
+                return {"error": f"Scraping failed: {str(e)}", "userName": username}
+
+    tasks = [asyncio.create_task(run(username)) for username in dict.fromkeys(usernames)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The client may disconnect mid-stream; stop scraping for it
+        for task in tasks:
+            task.cancel()
+
+def _problem_chunks(result: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+    """Splits a /problems result into the chunks stream_problem_list yields"""
+    if "error" in result:
+        yield result
+        return
+    yield {"userName": result["userName"], "problemsByDifficulty": result["problemsByDifficulty"]}
+    for name, problems in result["Problems"].items():
+        yield {"difficulty": name, "problems": problems}
+
+async def _crawl_problem_list(username: str, publish: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+    """Crawls the difficulty tabs, publishing each chunk as it is extracted; returns the assembled result"""
+    result: Dict[str, Any] = {}
+    problems: Dict[str, Any] = {}
+    # The crawl is not run through _RETRY, so the tab waits need the attempt timeout set here
+    set_attempt_timeout(_RETRY.timeout("problems"))
+    async with _ADMISSION.admit(admission.endpoint_class("problems")):
         try:
-            browser = await get_browser()
-            context = await browser.new_context()
-            page = await context.new_page()
-            
-            await page.goto(url, wait_until="networkidle", timeout=TIMEOUT_STD)
-
-            difficulties = ["SCHOOL", "BASIC", "EASY", "MEDIUM", "HARD"]
-            all_problems = {}
-            total_problems = {}
-            
-            if await page.locator(".ProblemNavbar_head__6ptDV").count() == 0:
-                return {"error": "Activity tab content not found", "userName": username}
-
-            for diff in difficulties:
-                tab_selector = f".ProblemNavbar_head_nav__OqbEt:has-text('{diff}')"
-                tab = page.locator(tab_selector)
-                
-                count = 0
-                if await tab.count() > 0:
-                    tab_text = await tab.inner_text()
-                    match = re.search(r'\((\d+)\)', tab_text)
-                    if match:
-                        count = int(match.group(1))
-                
-                total_problems[diff.capitalize()] = count
-
-                if count == 0:
-                    all_problems[diff.capitalize()] = []
-                    continue
-
-                await tab.click()
-                list_selector = "ul.SolvedProblemsContainer_problemList__8Ua09"
-                
-                try:
-                    await page.wait_for_selector(list_selector, timeout=TIMEOUT_SHORT)
-                    
-                    problems = await page.evaluate("""
-                        (selector) => {
-                            const container = document.querySelector(selector);
-                            if (!container) return [];
-                            const links = container.querySelectorAll("li a");
-                            return Array.from(links).map(a => ({
-                                question: a.innerText.trim(),
-                                questionUrl: a.href
-                            }));
-                        }
-                    """, list_selector)
-                    
-                    all_problems[diff.capitalize()] = problems
-
-                except Exception:
-                    print(f"⚠️ Could not load problem list for {diff}")
-                    all_problems[diff.capitalize()] = []
-
-            return {
-                "userName": username,
-                "problemsByDifficulty": total_problems,
-                "Problems": all_problems
-            }
-            
-        except PlaywrightError as e:
-            error_msg = str(e)
-            if "Target" in error_msg and "closed" in error_msg and attempt < max_retries - 1:
-                print(f"⚠️ Browser connection lost, retrying... (attempt {attempt + 1}/{max_retries})")
-                global _BROWSER
-                _BROWSER = None
-                await asyncio.sleep(1)
-                continue
-            return {"error": f"Browser error: {error_msg}", "userName": username}
+            async with _FLEET.page() as page:
+                url = f"{GFG_BASE_URL}/{username}?tab=activity"
+                if not await _load(page, url, attempt_timeout()):
+                    result = {"error": NOT_FOUND_ERROR, "userName": username}
+                    publish(result)
+                    return result
+                async for chunk in _iter_problem_list(page, username):
+                    if "difficulty" in chunk:
+                        problems[chunk["difficulty"]] = chunk["problems"]
+                    else:
+                        result = chunk
+                    publish(chunk)
+        except FleetUnavailable:
+            raise
         except Exception as e:
-            return {"error": f"Failed to fetch problem list: {str(e)}", "userName": username}
-        finally:
+            result = {"error": f"Failed to fetch problem list: {str(e)}", "userName": username}
+            publish(result)
+            return result
+    if "error" in result:
+        return result
+    return {**result, "Problems": problems}
+
+async def _stream_flight(username: str, broadcast: Broadcast) -> Dict[str, Any]:
+    """The /problems flight for a streamed request: chunks go out through broadcast, the result to the cache"""
+    key = ResultCache.key("problems", username)
+    try:
+        result = await _crawl_problem_list(username, broadcast.publish)
+    except BaseException as e:
+        broadcast.close(e)
+        raise
+    finally:
+        _STREAMS.pop(key, None)
+    broadcast.close()
+    await _record_result("problems", username, result)
+    await _CACHE.store("problems", username, result)
+    return result
+
+async def stream_problem_list(username: str) -> AsyncIterator[Dict[str, Any]]:
+    """Solved problems as a stream: the counts first, then one chunk per difficulty.
+
+    Cached results (and plain scrapes already in flight) are replayed as
+    chunks. Otherwise the crawl runs as the /problems flight for the user
+    and publishes each difficulty as soon as its tab is extracted; streams
+    and /problems requests arriving meanwhile join it. Clients read from
+    their own queue, so a slow reader never holds the browser page. With
+    scrape workers the browser is in another process, so the finished job
+    is replayed instead.
+    """
+    rejected = _rejected(username)
+    if rejected:
+        yield rejected
+        return
+    key = ResultCache.key("problems", username)
+    entry = None if key in _STREAMS else await _CACHE.lookup("problems", username)
+    broadcast = _STREAMS.get(key)
+    if broadcast is None:
+        replay = _JOBS is not None or key in _FLIGHTS.in_flight()
+        if replay or (entry is not None and entry.is_usable(time.time())):
+            for chunk in _problem_chunks(await fetch_problem_list(username)):
+                yield chunk
+            return
+        broadcast = _STREAMS[key] = Broadcast()
+        _FLIGHTS.start(key, lambda: _stream_flight(username, broadcast))
+
+    async for chunk in broadcast.subscribe():
+        yield chunk
+
+# --- Leaderboards ---
+
+async def _seed_from_store(name: str):
+    """Fills a group's indexes from recorded snapshots and cached results, without scraping"""
+    for kind in ("stats", "profile"):
+        missing = _LEADERBOARDS.missing(name)
+        if not missing:
+            return
+        known = await _HISTORY.latest(kind, missing) if _HISTORY else {}
+        for username in missing:
+            value = known.get(username)
+            if value is None:
+                entry = await _CACHE.lookup(kind, username)
+                value = entry.value if entry is not None else None
+            if value is not None:
+                _LEADERBOARDS.observe(kind, username, value)
+
+async def _scrape_missing(usernames: List[str]):
+    """Scrapes members nobody has fetched yet, once, at background priority"""
+    IN_BACKGROUND_REFRESH.set(True)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def scrape(username: str):
+        async with semaphore:
             try:
-                if page:
-                    await page.close()
-                if context:
-                    await context.close()
+                result = await _fetch_when_admitted(fetch_user_bundle, username)
             except Exception as e:
-                print(f"⚠️ Cleanup error: {e}")
+                result = {"error": str(e)}
+            if "error" in result:
+                print(f"⚠️ Could not scrape leaderboard member {username}: {result['error']}")
+
+    await asyncio.gather(*(scrape(username) for username in usernames))
+
+async def _seed_group(name: str):
+    await _seed_from_store(name)
+    missing = _LEADERBOARDS.missing(name)
+    previous = _SEEDING.pop(name, None)
+    if previous is not None:
+        previous.cancel()
+    if missing:
+        task = asyncio.create_task(_scrape_missing(missing))
+        _SEEDING[name] = task
+        task.add_done_callback(lambda t: _SEEDING.pop(name, None) if _SEEDING.get(name) is t else None)
+
+def _drop_group(name: str) -> bool:
+    task = _SEEDING.pop(name, None)
+    if task is not None:
+        task.cancel()
+    return _LEADERBOARDS.delete_group(name)
+
+async def _sync_leaderboards(force: bool = False):
+    """Brings this process's groups and indexes up to date with the shared store.
+
+    Groups whose revision changed are reloaded and seeded from the store, and
+    snapshots recorded since the last sync (by any process) update the
+    indexes. Runs at most once per LEADERBOARD_SYNC_INTERVAL unless forced.
+    """
+    global _LEADERBOARDS_SYNCED, _SNAPSHOTS_APPLIED
+    if _GROUPS is None:
+        return
+    async with _LEADERBOARD_SYNC:
+        if not force and time.monotonic() - _LEADERBOARDS_SYNCED < LEADERBOARD_SYNC_INTERVAL:
+            return
+        now = time.time()
+        try:
+            revisions = await asyncio.to_thread(_GROUPS.revisions)
+            for name in set(_LEADERBOARDS.groups) - set(revisions):
+                _drop_group(name)
+            changed = [name for name, revision in revisions.items()
+                       if name not in _LEADERBOARDS.groups or _LEADERBOARDS.groups[name].revision != revision]
+            for name, (revision, members) in (await asyncio.to_thread(_GROUPS.load, changed)).items():
+                _LEADERBOARDS.set_group(name, members, revision)
+                await _seed_from_store(name)
+            if _HISTORY is not None and _SNAPSHOTS_APPLIED is not None:
+                # Overlap by the SQLite busy timeout: a snapshot's ts is taken before its write commits
+                for kind, username, _, values in await _HISTORY.changed_since(_SNAPSHOTS_APPLIED - 10):
+                    _LEADERBOARDS.observe(kind, username, values)
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not sync leaderboard groups: {e}")
+            return
+        _SNAPSHOTS_APPLIED = now
+        _LEADERBOARDS_SYNCED = time.monotonic()
+
+async def set_leaderboard_group(name: str, usernames: Iterable[str]) -> Dict[str, Any]:
+    """Creates or replaces a group. Members without data are scraped once in the background.
+
+    Creating a group beyond LEADERBOARD_MAX_GROUPS gives an error result.
+    """
+    members = list(dict.fromkeys(usernames))[:LEADERBOARD_MAX_MEMBERS]
+    full = {"error": f"Too many leaderboard groups (at most {LEADERBOARD_MAX_GROUPS})", "group": name}
+    async with _LEADERBOARD_SYNC:
+        if _GROUPS is not None:
+            revision = await asyncio.to_thread(_GROUPS.save, name, members)
+            if revision is None:
+                return full
+        elif name not in _LEADERBOARDS.groups and len(_LEADERBOARDS.groups) >= LEADERBOARD_MAX_GROUPS:
+            return full
+        else:
+            revision = ""
+        group = _LEADERBOARDS.set_group(name, members, revision)
+    await _seed_group(name)
+    return {"group": name, "members": len(group.members), "pending": len(_LEADERBOARDS.missing(name))}
+
+async def delete_leaderboard_group(name: str) -> bool:
+    async with _LEADERBOARD_SYNC:
+        stored = await asyncio.to_thread(_GROUPS.delete, name) if _GROUPS else False
+        return _drop_group(name) or stored
+
+async def list_leaderboards() -> Dict[str, Any]:
+    await _sync_leaderboards()
+    return _LEADERBOARDS.stats()
+
+async def _known_group(name: str) -> bool:
+    await _sync_leaderboards()
+    if name not in _LEADERBOARDS.groups:
+        # Possibly created by another process since the last sync
+        await _sync_leaderboards(force=True)
+    return name in _LEADERBOARDS.groups
+
+async def leaderboard_page(name: str, metric: str, offset: int, limit: int) -> Optional[Dict[str, Any]]:
+    """One page of a group's ranking, or None for an unknown group"""
+    if not await _known_group(name):
+        return None
+    return _LEADERBOARDS.page(name, metric, offset, limit)
+
+async def compare_users(name: str, usernames: Iterable[str]) -> Optional[Dict[str, Any]]:
+    """Values and ranks of the given users within a group, or None for an unknown group"""
+    if not await _known_group(name):
+        return None
+    return _LEADERBOARDS.compare(name, usernames)
+
+async def start_leaderboards():
+    """Loads the stored groups and seeds them (called from the app lifespan)"""
+    await _sync_leaderboards(force=True)
+    for name in list(_LEADERBOARDS.groups):
+        await _seed_group(name)
+
+# --- Background Refresh ---
+
+async def _refresh_cached(kind: str, username: str):
+    """Re-scrapes one cache entry at background priority"""
+    IN_BACKGROUND_REFRESH.set(True)
+    await _fetch(kind, username)
+
+async def _refresh_one(kind: str, username: str):
+    # Own task, so the background flag does not leak into the scheduler loop
+    await asyncio.create_task(_refresh_cached(kind, username))
 
+async def _expires_at(kind: str, username: str):
+    entry = await _CACHE.lookup(kind, username)
+    return entry.expires_at if entry is not None else None
 
+_REFRESHER = RefreshScheduler(
+    tracker=_POPULARITY,
+    refresh=_refresh_one,
+    expires_at=_expires_at,
+    foreground_load=_ADMISSION.foreground_load,
+)
 
+def start_refresher():
+    """Starts the popularity-aware refresh loop (called from the app lifespan)"""
+    if REFRESH_ENABLED:
+        _REFRESHER.start()
 
+async def stop_refresher():
+    await _REFRESHER.stop()
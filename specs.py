@@ -0,0 +1,68 @@
+"""
+What the scrapers read from a GFG profile page.
+
+Every GFG class name lives here once. The browser scrapers run these specs
+in the page and the fast path runs the same specs over the server-rendered
+HTML, so a GFG redesign is an edit to this module only.
+"""
+
+from extraction import ExtractionSpec, Field, Labelled, ListOf
+
+
+# Page elements
+PROFILE_NAME = ".NewProfile_name__N_Nlw"
+PROFILE_DESIGNATION = ".NewProfile_designation__fujtZ"
+SCORE_CARD = ".ScoreContainer_score-card__zI4vG"
+SCORE_LABEL = ".ScoreContainer_label__aVpLE"
+SCORE_VALUE = ".ScoreContainer_value__7yy7h"
+PROBLEM_NAVBAR = ".ProblemNavbar_head__6ptDV"
+PROBLEM_TAB = ".ProblemNavbar_head_nav__OqbEt"
+PROBLEM_LIST = "ul.SolvedProblemsContainer_problemList__8Ua09"
+NEXT_DATA = "script#__NEXT_DATA__"
+
+# Rendered on every profile page whatever the user has filled in, so its
+# presence means the page loaded; sections a user lacks fall back to the
+# spec defaults instead of failing the wait
+PAGE_READY = PROFILE_NAME
+
+# Score card labels and the response fields they fill
+SCORE_CARD_FIELDS = {
+    "Coding Score": "codingScore",
+    "Problems Solved": "problemsSolved",
+    "Institute Rank": "instituteRank",
+    "Articles Published": "articlesPublished",
+}
+
+PROFILE_SPEC = ExtractionSpec(
+    fullName=Field(PROFILE_NAME),
+    designation=Field(PROFILE_DESIGNATION, default=""),
+    scores=Labelled(
+        SCORE_CARD,
+        label=Field(SCORE_LABEL),
+        value=Field(SCORE_VALUE, parse="int"),
+        labels=SCORE_CARD_FIELDS,
+    ),
+    # The POTD streaks are not rendered anywhere, only carried in the Next.js payload
+    nextData=Field(NEXT_DATA),
+)
+STATS_SPEC = ExtractionSpec(
+    counts=Field(PROBLEM_NAVBAR, attr="innerText", parse="counts"),
+)
+TABS_SPEC = ExtractionSpec(
+    navbar=Field(PROBLEM_NAVBAR),
+    tabs=ListOf(PROBLEM_TAB, {
+        "label": Field(attr="innerText"),
+        "count": Field(attr="innerText", parse="count", default=0),
+    }),
+)
+PROBLEM_LIST_SPEC = ExtractionSpec(
+    problems=ListOf(f"{PROBLEM_LIST} li a", {
+        "question": Field(attr="innerText"),
+        "questionUrl": Field(attr="href"),
+    }),
+)
+
+
+def problem_tab(difficulty: str) -> str:
+    """Playwright selector for the navbar tab whose label mentions difficulty"""
+    return f"{PROBLEM_TAB}:has-text('{difficulty}')"
@@ -1,14 +1,31 @@
-def generate_stats_svg(data: dict) -> str:
-    user_name = data.get("userName", "User")
-    total = data.get("totalProblemsSolved", 0)
-    school = data.get("School", 0)
-    basic = data.get("Basic", 0)
-    easy = data.get("Easy", 0)
-    medium = data.get("Medium", 0)
-    hard = data.get("Hard", 0)
-    profile_url = f"https://www.geeksforgeeks.org/profile/{{user_name}}?tab=activity"
-
-    return f"""<svg width="380" height="220" viewBox="0 0 380 220" xmlns="http://www.w3.org/2000/svg">
+"""
+SVG stats card renderer.
+
+The card template is split once, at import, into static byte segments and
+named slots. Rendered cards are cached by their stats tuple together with a
+strong ETag and precompressed gzip/brotli bodies, so repeat renders and
+conditional requests never rebuild or recompress the SVG.
+"""
+
+import gzip
+import hashlib
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from html import escape
+from string import Formatter
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+# Configuration
+SVG_CACHE_SIZE = int(os.environ.get("SVG_CACHE_SIZE", "4096"))
+
+_STATS_TEMPLATE = """<svg width="380" height="220" viewBox="0 0 380 220" xmlns="http://www.w3.org/2000/svg">
 <style>
 svg {{ font-family: 'Segoe UI', -apple-system, BlinkMacSystemFont, 'Roboto', sans-serif; }}}}
 #bg {{ fill: #0f1419; stroke: #1e2530; stroke-width: 1; rx: 12; ry: 12; }}
@@ -86,3 +103,179 @@ svg {{ font-family: 'Segoe UI', -apple-system, BlinkMacSystemFont, 'Roboto', san
   </g>
 </g>
 </svg>"""
+
+
+def _compile(template: str) -> List[Tuple[bytes, Optional[str]]]:
+    """Splits a str.format template into (static bytes, slot name) pairs"""
+    return [
+        (literal.encode("utf-8"), field_name)
+        for literal, field_name, _, _ in Formatter().parse(template)
+    ]
+
+
+_STATS_SEGMENTS = _compile(_STATS_TEMPLATE)
+
+
+@dataclass(frozen=True)
+class RenderedCard:
+    body: bytes
+    etag: str
+    gzip: bytes
+    brotli: Optional[bytes]
+
+    def variant(self, encoding: Optional[str]) -> Tuple[bytes, str]:
+        """Body and strong ETag for a content coding (None for identity)"""
+        if encoding == "br" and self.brotli is not None:
+            return self.brotli, f'"{self.etag}-br"'
+        if encoding == "gzip":
+            return self.gzip, f'"{self.etag}-gz"'
+        return self.body, f'"{self.etag}"'
+
+    def matches(self, if_none_match: str) -> bool:
+        """True if an If-None-Match header names any variant of this card"""
+        if if_none_match.strip() == "*":
+            return True
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag.strip('"') in (self.etag, f"{self.etag}-gz", f"{self.etag}-br"):
+                return True
+        return False
+
+
+def _render(segments: List[Tuple[bytes, Optional[str]]], values: Dict[str, bytes]) -> bytes:
+    parts = []
+    for literal, field_name in segments:
+        parts.append(literal)
+        if field_name is not None:
+            parts.append(values[field_name])
+    return b"".join(parts)
+
+
+@lru_cache(maxsize=SVG_CACHE_SIZE)
+def _render_stats(key: Tuple) -> RenderedCard:
+    user_name, total, school, basic, easy, medium, hard = key
+    values = {
+        "user_name": escape(str(user_name)).encode("utf-8"),
+        "profile_url": escape(f"https://www.geeksforgeeks.org/profile/{user_name}?tab=activity").encode("utf-8"),
+        "total": str(total).encode(),
+        "school": str(school).encode(),
+        "basic": str(basic).encode(),
+        "easy": str(easy).encode(),
+        "medium": str(medium).encode(),
+        "hard": str(hard).encode(),
+    }
+    body = _render(_STATS_SEGMENTS, values)
+    return RenderedCard(
+        body=body,
+        etag=hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:32],
+        gzip=gzip.compress(body, compresslevel=9, mtime=0),
+        brotli=brotli.compress(body) if brotli else None,
+    )
+
+
+def render_stats_card(data: dict) -> RenderedCard:
+    """Cached card for a stats dict, keyed by the values the card displays"""
+    key = (
+        data.get("userName", "User"),
+        data.get("totalProblemsSolved", 0),
+        data.get("School", 0),
+        data.get("Basic", 0),
+        data.get("Easy", 0),
+        data.get("Medium", 0),
+        data.get("Hard", 0),
+    )
+    return _render_stats(key)
+
+
+def generate_stats_svg(data: dict) -> str:
+    return render_stats_card(data).body.decode("utf-8")
+
+
+# --- Leaderboard card ---
+
+LEADERBOARD_METRIC_LABELS = {
+    "totalProblemsSolved": "Problems Solved",
+    "codingScore": "Coding Score",
+    "potdStreak": "POTD Streak",
+}
+LEADERBOARD_ROW_HEIGHT = 28
+
+_LEADERBOARD_TEMPLATE = """<svg width="380" height="{height}" viewBox="0 0 380 {height}" xmlns="http://www.w3.org/2000/svg">
+<style>
+svg {{ font-family: 'Segoe UI', -apple-system, BlinkMacSystemFont, 'Roboto', sans-serif; }}
+.header {{ font-size: 18px; font-weight: 700; fill: #f8f9fa; }}
+.subheader {{ font-size: 13px; fill: #adb5bd; font-weight: 500; }}
+.rank {{ font-size: 14px; font-weight: 800; fill: url(#totalGrad); }}
+.name {{ font-size: 13px; fill: #f8f9fa; font-weight: 600; }}
+.value {{ font-size: 14px; font-weight: 700; fill: #fff; }}
+.empty {{ font-size: 12px; fill: #6c757d; font-weight: 500; }}
+</style>
+
+<defs>
+  <linearGradient id="totalGrad" x1="0%" y1="0%" x2="100%" y2="100%">
+    <stop offset="0%" stop-color="#00d4aa"/>
+    <stop offset="50%" stop-color="#00a085"/>
+    <stop offset="100%" stop-color="#00795e"/>
+  </linearGradient>
+  <pattern id="grain" width="4" height="4" patternUnits="userSpaceOnUse">
+    <circle cx="2" cy="2" r="1" fill="#0f1419" opacity="0.1"/>
+  </pattern>
+</defs>
+
+<g transform="translate(10,10)">
+  <rect width="360" height="{inner_height}" rx="12" ry="12" fill="url(#grain)" stroke="#1e2530" stroke-width="1"/>
+  <rect width="360" height="80" rx="12" ry="12" fill="url(#totalGrad)" opacity="0.1"/>
+
+  <text x="25" y="28" class="header">GeeksforGeeks</text>
+  <text x="25" y="45" class="subheader">{group} · {metric}</text>
+
+  <rect x="20" y="60" width="320" height="1" rx="0.5" fill="#2c3e50" opacity="0.5"/>
+{rows}
+  <g transform="translate(280, 18)">
+    <rect width="70" height="20" rx="4" fill="#00c851" stroke="#00a843" stroke-width="0.5"/>
+    <text x="35" y="15" font-size="11" font-weight="600" fill="#fff" text-anchor="middle">GFG</text>
+  </g>
+</g>
+</svg>"""
+
+_LEADERBOARD_ROW = """  <text x="25" y="{y}" class="rank">#{rank}</text>
+  <a href="{profile_url}"><text x="75" y="{y}" class="name">@{user_name}</text></a>
+  <text x="335" y="{y}" class="value" text-anchor="end">{value}</text>
+"""
+
+
+@lru_cache(maxsize=SVG_CACHE_SIZE)
+def _render_leaderboard(key: Tuple) -> RenderedCard:
+    group, metric, entries = key
+    rows = "".join(
+        _LEADERBOARD_ROW.format(
+            y=88 + i * LEADERBOARD_ROW_HEIGHT,
+            rank=rank,
+            profile_url=escape(f"https://www.geeksforgeeks.org/profile/{user_name}"),
+            user_name=escape(str(user_name)),
+            value=value,
+        )
+        for i, (rank, user_name, value) in enumerate(entries)
+    ) or '  <text x="25" y="88" class="empty">No ranked members yet</text>\n'
+    inner_height = 70 + max(len(entries), 1) * LEADERBOARD_ROW_HEIGHT
+    body = _LEADERBOARD_TEMPLATE.format(
+        height=inner_height + 20,
+        inner_height=inner_height,
+        group=escape(group),
+        metric=escape(LEADERBOARD_METRIC_LABELS.get(metric, metric)),
+        rows=rows,
+    ).encode("utf-8")
+    return RenderedCard(
+        body=body,
+        etag=hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:32],
+        gzip=gzip.compress(body, compresslevel=9, mtime=0),
+        brotli=brotli.compress(body) if brotli else None,
+    )
+
+
+def render_leaderboard_card(page: dict) -> RenderedCard:
+    """Cached card for a leaderboard page, keyed by the rows it displays"""
+    entries = tuple((e["rank"], e["userName"], e["value"]) for e in page["entries"])
+    return _render_leaderboard((page["group"], page["metric"], entries))
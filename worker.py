@@ -0,0 +1,33 @@
+"""
+Scrape worker.
+
+Owns the browser fleet and runs the scrape jobs API processes queue in the
+SCRAPE_QUEUE database, so API workers can be scaled for request fan-in
+independently of browser capacity. Start one (or more) next to the API:
+
+    SCRAPE_QUEUE=/tmp/gfg-jobs.db python worker.py
+    SCRAPE_QUEUE=/tmp/gfg-jobs.db uvicorn main:app --workers 4
+"""
+
+import asyncio
+
+import scraper
+from jobs import SCRAPE_QUEUE, JobWorker
+
+
+async def main():
+    if not SCRAPE_QUEUE:
+        raise SystemExit("❌ Set SCRAPE_QUEUE to the job database shared with the API processes")
+    worker = JobWorker(scraper.run_job)
+    scraper.start_warmup(owns_browsers=True)
+    try:
+        await worker.serve()
+    finally:
+        await scraper.close_browser()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass